@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import sqlite3
+import zlib
+import argparse
+import platform
+import itertools
+from typing import Dict, Any, List, Optional, Tuple
+
+import pymysql
+
+import burster
+
+
+# (download Mbps, share of plans); upload is DL/10 for most plans, symmetric for fiber
+DOWNLOAD_TIERS = [
+    (5, 0.05),
+    (10, 0.10),
+    (25, 0.20),
+    (50, 0.25),
+    (100, 0.20),
+    (250, 0.10),
+    (500, 0.06),
+    (1000, 0.04),
+]
+SYMMETRIC_SHARE = 0.3
+LEGACY_DSL = [(0.768, 0.128), (1.5, 0.384), (3.0, 0.768)]
+LEGACY_SHARE = 0.02
+
+PLANS_DDL = {
+    "mysql": """
+        CREATE TABLE plans (
+            id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+            PLAN VARCHAR(64) NOT NULL,
+            UL DECIMAL(10,3) NOT NULL,
+            DL DECIMAL(10,3) NOT NULL,
+            PRIMARY KEY (id)
+        );
+    """,
+    "sqlite": """
+        CREATE TABLE plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            PLAN TEXT NOT NULL,
+            UL REAL NOT NULL,
+            DL REAL NOT NULL
+        );
+    """,
+}
+
+# Same shape as the stock FreeRADIUS radgroupcheck/radgroupreply schema
+TEMPLATE_DDL = {
+    "mysql": """
+        CREATE TABLE {name} (
+            id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+            groupname VARCHAR(64) NOT NULL DEFAULT '',
+            attribute VARCHAR(64) NOT NULL DEFAULT '',
+            op CHAR(2) NOT NULL DEFAULT '==',
+            value VARCHAR(253) NOT NULL DEFAULT '',
+            PRIMARY KEY (id),
+            KEY groupname (groupname(32))
+        );
+    """,
+    "sqlite": """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            groupname TEXT NOT NULL DEFAULT '',
+            attribute TEXT NOT NULL DEFAULT '',
+            op TEXT NOT NULL DEFAULT '==',
+            value TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX {name}_groupname ON {name} (groupname);
+    """,
+}
+
+
+def generate_plans(count: int, seed: int = 0) -> List[Tuple[str, float, float]]:
+    rng = random.Random(seed)
+    speeds = [dl for dl, _ in DOWNLOAD_TIERS]
+    weights = [share for _, share in DOWNLOAD_TIERS]
+    plans: List[Tuple[str, float, float]] = []
+    for idx in range(count):
+        if rng.random() < LEGACY_SHARE:
+            dl, ul = rng.choice(LEGACY_DSL)
+            kind = "DSL"
+        else:
+            dl = rng.choices(speeds, weights)[0]
+            if rng.random() < SYMMETRIC_SHARE:
+                ul, kind = dl, "FIB"
+            else:
+                ul, kind = max(1, dl // 10), "RES"
+        plans.append((f"{kind}-{dl:g}M-{idx:07d}", float(ul), float(dl)))
+    return plans
+
+
+# --- SQLite stand-in -------------------------------------------------------
+#
+# Just enough of the PyMySQL connection/cursor API, and of the MySQL dialect
+# burster emits, to run the full-rebuild pipeline without a MySQL server.
+# Timings are only comparable between SQLite runs, never against MySQL.
+
+
+class StandInError(pymysql.err.OperationalError):
+    pass
+
+
+_index_ids = itertools.count(1)
+
+
+class StandInCursor:
+    def __init__(self, con: "StandInConnection", dict_rows: bool) -> None:
+        self.con = con
+        self.dict_rows = dict_rows
+        self.max_stmt_length = 1024000
+        self.rowcount = -1
+        self._rows: List[Any] = []
+
+    def _set_result(self, cur: sqlite3.Cursor) -> None:
+        self.rowcount = cur.rowcount
+        rows = cur.fetchall() if cur.description else []
+        if self.dict_rows and cur.description:
+            names = [col[0] for col in cur.description]
+            rows = [dict(zip(names, row)) for row in rows]
+        self._rows = rows
+
+    @staticmethod
+    def _translate(query: str, bound: bool = False) -> str:
+        query = re.sub(r"%\((\w+)\)s", r":\1", query)
+        if bound:
+            # Like PyMySQL: with parameters, %s is a placeholder and %% a literal %
+            query = re.sub(r"%([%s])", lambda m: "?" if m.group(1) == "s" else "%", query)
+        else:
+            query = query.replace("%s", "?")
+        # Everything is already UTF-8 in SQLite
+        query = re.sub(r"(?i)\bCONVERT\(((?:[^()]|\([^()]*\))*)\s+USING\s+\w+\)", r"\1", query)
+        # MySQL's UPDATE ... JOIN is UPDATE ... FROM in SQLite, which takes no alias on SET columns
+        query = re.sub(
+            r"(?is)^UPDATE\s+(\w+)\s+(\w+)\s+JOIN\s+(\w+)\s+(\w+)\s+ON\s+(.+?)\s+SET\s+\w+\.(.+?)\s+WHERE\s+",
+            r"UPDATE \1 AS \2 SET \6 FROM \3 AS \4 WHERE \5 AND ",
+            query,
+        )
+        return re.sub(r"\s+FOR UPDATE\s*;?\s*$", ";", query)
+
+    def execute(self, query: str, args: Any = None) -> int:
+        statement = query.strip().rstrip(";").strip()
+        burster.metrics.count_round_trip()
+        try:
+            handled = self.con.run_mysql_statement(self, statement, args)
+            if not handled:
+                cur = self.con.db.execute(
+                    self._translate(query, args is not None), args if args is not None else ()
+                )
+                self._set_result(cur)
+        except sqlite3.Error as e:
+            raise StandInError(0, str(e))
+        return self.rowcount
+
+    def executemany(self, query: str, args: List[Any]) -> int:
+        burster.metrics.count_round_trip()
+        try:
+            cur = self.con.db.executemany(self._translate(query, True), args)
+        except sqlite3.Error as e:
+            raise StandInError(0, str(e))
+        self.rowcount = cur.rowcount
+        self._rows = []
+        return self.rowcount
+
+    def fetchone(self) -> Any:
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self) -> None:
+        self._rows = []
+
+
+def _crc32(value: Any) -> Optional[int]:
+    return None if value is None else zlib.crc32(str(value).encode("utf-8"))
+
+
+def _concat_ws(separator: str, *values: Any) -> str:
+    return separator.join(str(value) for value in values if value is not None)
+
+
+class StandInConnection:
+    def __init__(self, path: str) -> None:
+        self.db = sqlite3.connect(path, timeout=120, check_same_thread=False)
+        # The MySQL functions behind burster's table fingerprints
+        self.db.create_function("CRC32", 1, _crc32, deterministic=True)
+        self.db.create_function("CONCAT_WS", -1, _concat_ws, deterministic=True)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS standin_table_comments (name TEXT PRIMARY KEY, comment TEXT);"
+        )
+        self.db.commit()
+
+    def cursor(self, cursorclass: Any = None) -> StandInCursor:
+        dict_rows = cursorclass is not None and issubclass(cursorclass, pymysql.cursors.DictCursorMixin)
+        return StandInCursor(self, dict_rows)
+
+    def run_mysql_statement(self, cur: StandInCursor, statement: str, args: Any) -> bool:
+        handled = self._run_mysql_statement(cur, statement, args)
+        if handled and re.match(r"(?i)^(DROP|CREATE|ALTER|RENAME)\s+(?!TEMPORARY\b)", statement):
+            self.db.commit()  # MySQL DDL commits implicitly, except on TEMPORARY tables
+        return handled
+
+    def _run_mysql_statement(self, cur: StandInCursor, statement: str, args: Any) -> bool:
+        db = self.db
+        if re.match(r"(?i)^SET\s+SESSION\b", statement):
+            cur._rows = []
+            return True
+        if re.match(r"(?i)^SELECT\s+@@max_allowed_packet$", statement):
+            cur._rows = [(64 * 1024 * 1024,)]
+            return True
+        if re.match(r"(?i)^LOAD\s+DATA\b", statement):
+            raise StandInError(1148, "LOAD DATA is not supported by the SQLite stand-in")
+        match = re.match(r"(?i)^DROP\s+TEMPORARY\s+TABLE\s+IF\s+EXISTS\s+(.+)$", statement)
+        if match:
+            for name in (part.strip() for part in match.group(1).split(",")):
+                db.execute(f"DROP TABLE IF EXISTS temp.{name};")
+            cur._rows = []
+            return True
+        match = re.match(r"(?i)^CREATE\s+TEMPORARY\s+TABLE\s+(\w+)\s+LIKE\s+(\w+)$", statement)
+        if match:
+            target, source = match.groups()
+            (sql,) = db.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?;", (source,)
+            ).fetchone()
+            db.execute(re.sub(r"(?i)^CREATE TABLE\s+\"?\w+\"?", f"CREATE TEMP TABLE {target}", sql))
+            cur._rows = []
+            return True
+        match = re.match(
+            r"(?i)^CREATE\s+TEMPORARY\s+TABLE\s+(\w+)\s+\(PRIMARY\s+KEY\s+\(([\w\s,]+)\)\)\s+"
+            r"SELECT\s+([\w\s,]+?)\s+FROM\s+(\w+)\s+LIMIT\s+0$",
+            statement,
+        )
+        if match:
+            # An empty copy of some of a table's columns, with a key of its own
+            target, key, columns, source = match.groups()
+            types = {row[1]: row[2] for row in db.execute(f"PRAGMA table_info({source});").fetchall()}
+            names = [name.strip() for name in columns.split(",")]
+            db.execute(
+                f"CREATE TEMP TABLE {target} ("
+                + ", ".join(f"{name} {types[name]} NOT NULL" for name in names)
+                + f", PRIMARY KEY ({key}));"
+            )
+            cur._rows = []
+            return True
+        match = re.match(r"(?i)^DROP\s+TABLE\s+IF\s+EXISTS\s+(.+)$", statement)
+        if match:
+            for name in (part.strip() for part in match.group(1).split(",")):
+                db.execute(f"DROP TABLE IF EXISTS {name};")
+                db.execute("DELETE FROM standin_table_comments WHERE name = ?;", (name,))
+            cur._rows = []
+            return True
+        match = re.match(r"(?i)^CREATE\s+TABLE\s+(\w+)\s+LIKE\s+(\w+)$", statement)
+        if match:
+            target, source = match.groups()
+            for kind, sql in db.execute(
+                "SELECT type, sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL "
+                "ORDER BY type DESC;",
+                (source,),
+            ).fetchall():
+                if kind == "table":
+                    db.execute(re.sub(r"(?i)^CREATE TABLE\s+\"?\w+\"?", f"CREATE TABLE {target}", sql))
+                else:
+                    sql = re.sub(r"(?i)^CREATE INDEX\s+\w+", f"CREATE INDEX {target}_{next(_index_ids)}", sql)
+                    db.execute(re.sub(r"(?i)\bON\s+\"?\w+\"?", f"ON {target}", sql, count=1))
+            cur._rows = []
+            return True
+        match = re.match(r"(?i)^ALTER\s+TABLE\s+(\w+)\s+COMMENT\s*=\s*'(.*)'$", statement)
+        if match:
+            db.execute(
+                "INSERT OR REPLACE INTO standin_table_comments (name, comment) VALUES (?, ?);",
+                match.groups(),
+            )
+            cur._rows = []
+            return True
+        match = re.match(r"(?i)^RENAME\s+TABLE\s+(.+)$", statement)
+        if match:
+            # SQLite DDL is transactional, so the renames are as atomic as MySQL's
+            db.commit()
+            db.execute("BEGIN;")
+            try:
+                for pair in match.group(1).split(","):
+                    old, new = re.split(r"(?i)\s+TO\s+", pair.strip())
+                    db.execute(f"ALTER TABLE {old} RENAME TO {new};")
+                    db.execute(
+                        "UPDATE standin_table_comments SET name = ? WHERE name = ?;", (new, old)
+                    )
+                db.execute("COMMIT;")
+            except sqlite3.Error:
+                db.execute("ROLLBACK;")
+                raise
+            cur._rows = []
+            return True
+        if "information_schema.TABLES" in statement:
+            like = re.search(r"LIKE\s+'([^']*)'", statement)
+            cur._rows = db.execute(
+                "SELECT m.name, COALESCE(c.comment, '') FROM sqlite_master m "
+                "LEFT JOIN standin_table_comments c ON c.name = m.name "
+                "WHERE m.type = 'table' AND m.name LIKE ?;",
+                (like.group(1) if like else "%",),
+            ).fetchall()
+            return True
+        return False
+
+    def autocommit(self, value: bool) -> None:
+        pass
+
+    def ping(self, reconnect: bool = False) -> None:
+        self.db.execute("SELECT 1;")
+
+    def begin(self) -> None:
+        self.db.commit()
+        self.db.execute("BEGIN;")
+
+    def commit(self) -> None:
+        self.db.commit()
+
+    def rollback(self) -> None:
+        self.db.rollback()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def sqlite_connector(workdir: str) -> Any:
+    def _connect(host: str, db: str, user: str, password: str, **kwargs: Any) -> StandInConnection:
+        return StandInConnection(os.path.join(workdir, f"{db}.sqlite3"))
+
+    return _connect
+
+
+# --- Fixtures ---------------------------------------------------------------
+
+
+def _mysql_admin(args: argparse.Namespace, db: Optional[str] = None) -> Any:
+    return pymysql.connect(
+        host=args.mysql_host,
+        port=args.mysql_port,
+        user=args.mysql_user,
+        password=args.mysql_pass,
+        database=db,
+        autocommit=True,
+    )
+
+
+def _run_script(cur: Any, script: str) -> None:
+    for statement in script.split(";"):
+        if statement.strip():
+            cur.execute(statement)
+
+
+def raddb_names(args: argparse.Namespace) -> List[str]:
+    # One scratch RADIUS DB per --targets
+    return [args.raddb] + [f"{args.raddb}_{n}" for n in range(2, args.targets + 1)]
+
+
+def prepare_databases(args: argparse.Namespace, plans: List[Tuple[str, float, float]]) -> None:
+    if args.backend == "sqlite":
+        for name in [args.bbdb] + raddb_names(args):
+            path = os.path.join(args.workdir, f"{name}.sqlite3")
+            if os.path.exists(path):
+                os.unlink(path)
+        bbdb = sqlite3.connect(os.path.join(args.workdir, f"{args.bbdb}.sqlite3"))
+        bbdb.executescript(PLANS_DDL["sqlite"])
+        bbdb.executemany("INSERT INTO plans (PLAN, UL, DL) VALUES (?, ?, ?);", plans)
+        bbdb.commit()
+        bbdb.close()
+        for raddb_name in raddb_names(args):
+            raddb = sqlite3.connect(os.path.join(args.workdir, f"{raddb_name}.sqlite3"))
+            for name in ("radgroupcheck", "radgroupreply"):
+                raddb.executescript(TEMPLATE_DDL["sqlite"].format(name=f"{name}_template"))
+                raddb.executescript(TEMPLATE_DDL["sqlite"].format(name=name))
+            raddb.commit()
+            raddb.close()
+        return
+
+    con = _mysql_admin(args)
+    try:
+        cur = con.cursor()
+        for name in [args.bbdb] + raddb_names(args):
+            cur.execute(f"DROP DATABASE IF EXISTS {name};")
+            cur.execute(f"CREATE DATABASE {name} CHARACTER SET utf8mb4;")
+        cur.execute(f"USE {args.bbdb};")
+        _run_script(cur, PLANS_DDL["mysql"])
+        cur.executemany("INSERT INTO plans (PLAN, UL, DL) VALUES (%s, %s, %s);", plans)
+        for raddb_name in raddb_names(args):
+            cur.execute(f"USE {raddb_name};")
+            for name in ("radgroupcheck", "radgroupreply"):
+                _run_script(cur, TEMPLATE_DDL["mysql"].format(name=f"{name}_template"))
+                _run_script(cur, TEMPLATE_DDL["mysql"].format(name=name))
+    finally:
+        con.close()
+
+
+def count_live_rows(args: argparse.Namespace) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    if args.backend == "sqlite":
+        con = sqlite3.connect(os.path.join(args.workdir, f"{args.raddb}.sqlite3"))
+        for name in ("radgroupcheck", "radgroupreply"):
+            counts[name] = con.execute(f"SELECT COUNT(*) FROM {name};").fetchone()[0]
+        con.close()
+        return counts
+    con = _mysql_admin(args, args.raddb)
+    try:
+        cur = con.cursor()
+        for name in ("radgroupcheck", "radgroupreply"):
+            cur.execute(f"SELECT COUNT(*) FROM {name};")
+            counts[name] = int(cur.fetchone()[0])
+    finally:
+        con.close()
+    return counts
+
+
+def configure_env(args: argparse.Namespace) -> None:
+    for prefix, db in (("BBDB", args.bbdb), ("RADDB", args.raddb)):
+        os.environ[f"{prefix}_HOST"] = args.mysql_host
+        os.environ[f"{prefix}_PORT"] = str(args.mysql_port)
+        os.environ[f"{prefix}_DB"] = db
+        os.environ[f"{prefix}_USER"] = args.mysql_user
+        os.environ[f"{prefix}_PASS"] = args.mysql_pass
+    if args.targets > 1:
+        # Same server and login, one database per target
+        names = raddb_names(args)
+        os.environ["RADDB_TARGETS"] = ",".join(f"t{n}" for n in range(1, len(names) + 1))
+        for n, db in enumerate(names, 1):
+            os.environ[f"RADDB_T{n}_DB"] = db
+    # Keep whatever main settings .env provides; fill in the stock ones otherwise
+    for key, value in (
+        ("BURSTER_SBP", "200000"),
+        ("BURSTER_BURST_PERIOD", "8"),
+        ("BURSTER_BOOST_PERC", "0"),
+        ("BURSTER_SESSION_TIMEOUT", "3600"),
+        ("BURSTER_FRAMED_POOL", "cust"),
+    ):
+        os.environ.setdefault(key, value)
+    os.environ.setdefault("TQDM_DISABLE", "1")
+
+
+def parse_sizes(value: str) -> List[int]:
+    sizes = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        scale = {"k": 1_000, "m": 1_000_000}.get(part[-1], 1)
+        sizes.append(int(float(part.rstrip("km")) * scale))
+    if not sizes:
+        raise argparse.ArgumentTypeError(f"invalid plan sizes: {value!r}")
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the burster pipeline on synthetic plans tables. "
+        "Unrecognized arguments are passed through to burster (e.g. --engine rows --stream)."
+    )
+    parser.add_argument("--plans", type=parse_sizes, default=parse_sizes("1k,10k,100k"),
+                        help="Comma-separated plan counts, k/m suffixes allowed (default 1k,10k,100k)")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per plan count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json", help="JSON results path ('-' for stdout)")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--workdir", default=".bench", help="Directory for SQLite databases")
+    parser.add_argument("--bbdb", default="burster_bench_bbdb")
+    parser.add_argument("--raddb", default="burster_bench_raddb")
+    parser.add_argument("--targets", type=int, default=1,
+                        help="RADIUS DBs to deploy to at once (RADDB_TARGETS); extra ones are <raddb>_2, <raddb>_3, ...")
+    parser.add_argument("--mysql-host", default=os.getenv("BENCH_MYSQL_HOST", "127.0.0.1"))
+    parser.add_argument("--mysql-port", type=int, default=int(os.getenv("BENCH_MYSQL_PORT", "3306")))
+    parser.add_argument("--mysql-user", default=os.getenv("BENCH_MYSQL_USER", "root"))
+    parser.add_argument("--mysql-pass", default=os.getenv("BENCH_MYSQL_PASS", ""))
+    args, burster_args = parser.parse_known_args()
+
+    configure_env(args)
+    if args.backend == "sqlite":
+        os.makedirs(args.workdir, exist_ok=True)
+        burster.set_connector(sqlite_connector(args.workdir))
+
+    results: List[Dict[str, Any]] = []
+    for size in args.plans:
+        plans = generate_plans(size, args.seed)
+        for attempt in range(1, args.repeat + 1):
+            prepare_databases(args, plans)
+            started = time.perf_counter()
+            burster.main(burster_args)
+            wall = time.perf_counter() - started
+            run = burster.metrics.as_dict()
+            result = {
+                "plans": size,
+                "attempt": attempt,
+                "wall_seconds": wall,
+                "rows": count_live_rows(args),
+                "phases": run["phases"],
+            }
+            results.append(result)
+            print(
+                f"{size:>9} plans  run {attempt}: {wall:8.3f}s  "
+                + "  ".join(f"{name}={entry['seconds']:.3f}s" for name, entry in run["phases"].items()),
+                file=sys.stderr,
+            )
+
+    report = {
+        "label": args.label,
+        "backend": args.backend,
+        "burster_args": burster_args,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+            fh.write("\n")
+
+
+if __name__ == "__main__":
+    main()
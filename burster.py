@@ -1,24 +1,111 @@
 #!/usr/bin/env python3
 
+from __future__ import annotations
+
 import os
 import csv
 import argparse
+import bisect
 import sys
 import logging
 import logging.handlers
+import multiprocessing
 import configparser
-from typing import Dict, Any, List, Tuple
-
-from dotenv import load_dotenv
-from tqdm import tqdm
+import contextlib
+import gzip
+import hashlib
+import itertools
+import queue
+import re
+import signal
+import tempfile
+import threading
+import time
+import json
+import zlib
+from array import array
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Dict, Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from dotenv import dotenv_values, find_dotenv
 import pymysql
 
 pymysql.install_as_MySQLdb()
 import MySQLdb as mdb
-import pandas as pd
 
-
-load_dotenv()
+# numpy/pandas (and tqdm) cost more to import than a small run takes; only the columnar
+# and rows engines and the progress bars need them, so they are imported where used
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# .env never overrides the real environment; remember what it set so --watch can reload it
+_BASE_ENV_KEYS = frozenset(os.environ)
+_DOTENV_PATH = find_dotenv()
+_dotenv_keys: set = set()
+
+
+def load_env() -> None:
+    values = dotenv_values(_DOTENV_PATH) if _DOTENV_PATH else {}
+    for key in _dotenv_keys - values.keys():
+        os.environ.pop(key, None)
+    _dotenv_keys.clear()
+    for key, value in values.items():
+        if value is not None and key not in _BASE_ENV_KEYS:
+            os.environ[key] = value
+            _dotenv_keys.add(key)
+
+
+load_env()
+
+ATTRIBUTE_COLUMNS = ["groupname", "attribute", "op", "value"]
+ENGINES = ("buffers", "columnar", "rows")
+LOADERS = ("executemany", "load_data")
+# all: every RADIUS DB target swaps or none does; best_effort: every target that staged cleanly swaps
+FANOUT_POLICIES = ("all", "best_effort")
+
+DEFAULT_PERCENT = 100
+# Pre-staged burst tiers: radgroup{check,reply}_tier<percent>, tagged with a table comment
+TIER_COMMENT_PREFIX = "burster tier "
+TIER_COMMENT_RE = re.compile(r"^burster tier (\d+)$")
+TIER_TABLE_RE = re.compile(r"^radgroup(check|reply)_tier\d+$")
+
+# Previously live tables kept for --rollback: radgroup{check,reply}_gen_<UTC timestamp>[_<n>], retired
+# ones are renamed to radgroup{check,reply}_old_<stamp> and dropped; _<n> orders deploys within a second
+LIVE_TABLES = ("radgroupcheck", "radgroupreply")
+GENERATION_TABLE_RE = re.compile(r"^(radgroup(?:check|reply))_gen_(\d{14}(?:_\d+)?)$")
+RETIRED_TABLE_RE = re.compile(r"^radgroup(check|reply)_old_\d{14}(?:_\d+)?$")
+
+# Server/client error codes meaning LOAD DATA LOCAL INFILE is switched off
+LOAD_DATA_DISABLED_ERRORS = {1148, 2068, 3948}
+MIN_STMT_LENGTH = 64 * 1024
+PACKET_HEADROOM = 16 * 1024
+
+# Bump when the generated rows change for reasons the output cache hash does not see
+OUTPUT_CACHE_VERSION = 2
+
+# Per-plan radgroupreply attributes, in the order build_plan_attribute_rows emits them
+PLAN_REPLY_ATTRIBUTES = [
+    "Session-Timeout",
+    "Framed-Pool",
+    "Mikrotik-Rate-Limit",
+    "Alc-Subsc-Prof-Str",
+    "Alc-SLA-Prof-Str",
+    "NetElastic-Input-Average-Rate",
+    "NetElastic-Output-Average-Rate",
+    "Cambium-ePMP-Max-Burst-Uplink-Rate",
+    "Cambium-ePMP-Max-Burst-Downlink-Rate",
+    "NetElastic-Lease-Time",
+    "Filter-Id",
+    "NetElastic-Portal-Mode",
+]
 
 
 def _require(cfg: configparser.RawConfigParser, section: str, key: str) -> str:
@@ -27,21 +114,128 @@ def _require(cfg: configparser.RawConfigParser, section: str, key: str) -> str:
     raise RuntimeError(f"Missing required config: [{section}] {key} (set in .env)")
 
 
-def get_bbdb_creds(cfg: configparser.RawConfigParser) -> Dict[str, str]:
+def get_db_creds(cfg: configparser.RawConfigParser, section: str) -> Dict[str, str]:
     return {
-        "host": _require(cfg, "bbdb", "host"),
-        "db": _require(cfg, "bbdb", "db"),
-        "user": _require(cfg, "bbdb", "user"),
-        "pass": _require(cfg, "bbdb", "pass"),
+        "host": _require(cfg, section, "host"),
+        "port": cfg.get(section, "port", fallback="3306"),
+        "db": _require(cfg, section, "db"),
+        "user": _require(cfg, section, "user"),
+        "pass": _require(cfg, section, "pass"),
     }
 
 
+def get_bbdb_creds(cfg: configparser.RawConfigParser) -> Dict[str, str]:
+    return get_db_creds(cfg, "bbdb")
+
+
 def get_raddb_creds(cfg: configparser.RawConfigParser) -> Dict[str, str]:
+    return get_db_creds(cfg, "raddb")
+
+
+def get_raddb_targets(cfg: configparser.RawConfigParser) -> List[str]:
+    # Config sections of the RADIUS DBs to deploy to: [raddb:<name>] per RADDB_TARGETS entry, else [raddb]
+    names = [name.strip() for name in cfg.get("main", "raddb_targets", fallback="").split(",") if name.strip()]
+    return [f"raddb:{name}" for name in names] or ["raddb"]
+
+
+def target_name(section: str) -> str:
+    return section.partition(":")[2] or section
+
+
+def target_config(cfg: configparser.RawConfigParser, section: str) -> configparser.RawConfigParser:
+    # Copy of cfg whose [raddb] is the target's section laid over the shared [raddb] settings
+    if section == "raddb":
+        return cfg
+    view = configparser.RawConfigParser()
+    view.read_dict({name: dict(cfg.items(name)) for name in cfg.sections() if name != "raddb"})
+    raddb = dict(cfg.items("raddb")) if cfg.has_section("raddb") else {}
+    if cfg.has_section(section):
+        raddb.update(cfg.items(section))
+    view.read_dict({"raddb": raddb})
+    return view
+
+
+def get_fanout_policy(cfg: configparser.RawConfigParser) -> str:
+    policy = cfg.get("main", "fanout_policy", fallback="all")
+    if policy not in FANOUT_POLICIES:
+        raise RuntimeError(f"Invalid fanout policy: {policy} (expected one of {', '.join(FANOUT_POLICIES)})")
+    return policy
+
+
+def get_loader(cfg: configparser.RawConfigParser) -> str:
+    loader = cfg.get("main", "loader", fallback="executemany")
+    if loader not in LOADERS:
+        raise RuntimeError(f"Invalid loader: {loader} (expected one of {', '.join(LOADERS)})")
+    return loader
+
+
+def get_defer_indexes(cfg: configparser.RawConfigParser) -> bool:
+    return cfg.getboolean("main", "defer_indexes", fallback=False)
+
+
+def get_load_tmpdir(cfg: configparser.RawConfigParser) -> str:
+    if cfg.has_option("main", "load_tmpdir"):
+        return cfg.get("main", "load_tmpdir")
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def get_rate_cache_size(cfg: configparser.RawConfigParser) -> int:
+    return cfg.getint("main", "rate_cache_size", fallback=4096)
+
+
+def get_metrics_paths(cfg: configparser.RawConfigParser) -> Tuple[Optional[str], Optional[str]]:
+    return (
+        cfg.get("main", "metrics_textfile", fallback=None) or None,
+        cfg.get("main", "metrics_json", fallback=None) or None,
+    )
+
+
+def get_keep_generations(cfg: configparser.RawConfigParser) -> int:
+    return cfg.getint("main", "keep_generations", fallback=0)
+
+
+def get_verify_staging(cfg: configparser.RawConfigParser) -> bool:
+    return cfg.getboolean("main", "verify_staging", fallback=True)
+
+
+def get_output_cache(cfg: configparser.RawConfigParser) -> Optional[str]:
+    return cfg.get("main", "output_cache", fallback=None) or None
+
+
+def get_plans_table(cfg: configparser.RawConfigParser) -> str:
+    return cfg.get("bbdb", "plans_table", fallback="plans")
+
+
+def get_plans_filter(cfg: configparser.RawConfigParser) -> Optional[str]:
+    # Operator-supplied SQL condition selecting the plans to deploy, e.g. to skip retired ones
+    return cfg.get("bbdb", "plans_filter", fallback=None) or None
+
+
+def get_plans_file(cfg: configparser.RawConfigParser) -> Optional[str]:
+    return cfg.get("bbdb", "plans_file", fallback=None) or None
+
+
+def get_pool_config(cfg: configparser.RawConfigParser, section: str) -> Dict[str, Any]:
+    def _bool(key: str) -> Any:
+        if not cfg.has_option(section, key):
+            return None  # leave the server default alone
+        return cfg.getboolean(section, key)
+
+    size = cfg.getint(section, "pool_size", fallback=4)
+    if section != "bbdb":
+        # Every load worker holds a RADIUS DB connection of its own; a smaller pool would time them out
+        size = max(size, cfg.getint("main", "load_workers", fallback=1))
     return {
-        "host": _require(cfg, "raddb", "host"),
-        "db": _require(cfg, "raddb", "db"),
-        "user": _require(cfg, "raddb", "user"),
-        "pass": _require(cfg, "raddb", "pass"),
+        "size": size,
+        "ping_interval": cfg.getfloat(section, "pool_ping_interval", fallback=30.0),
+        "timeout": cfg.getfloat(section, "pool_timeout", fallback=60.0),
+        "autocommit": _bool("autocommit"),
+        "unique_checks": _bool("unique_checks"),
+        "foreign_key_checks": _bool("foreign_key_checks"),
+        # Only the RADIUS side ever loads files, and only with the load_data loader
+        "local_infile": cfg.getboolean(
+            section, "local_infile", fallback=section != "bbdb" and get_loader(cfg) == "load_data"
+        ),
     }
 
 
@@ -89,24 +283,350 @@ def setup_logging() -> logging.Logger:
     return logger
 
 
-def read_csv_file(filename: str) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
+# Wall time per pipeline phase for the current run; phases that run several times accumulate
+class RunMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.phases: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+            self.values: Dict[str, float] = {}
+            self.round_trips = 0
+            # (name, start, end) of every phase call on the perf_counter clock, for lining other
+            # measurements up against the run
+            self.spans: List[Tuple[str, float, float]] = []
+
+    def _entry(self, name: str) -> Dict[str, float]:
+        return self.phases.setdefault(
+            name, {"seconds": 0.0, "calls": 0, "rows": 0, "round_trips": 0, "peak_rss_bytes": 0}
+        )
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        # Phases nest per thread; round trips count against the innermost one
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            ended = time.perf_counter()
+            self.record(name, ended - started)
+            with self._lock:
+                self.spans.append((name, started, ended))
+
+    def record(self, name: str, seconds: float) -> None:
+        rss = peak_rss_bytes()
+        with self._lock:
+            entry = self._entry(name)
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+            entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"], rss)
+
+    def add_rows(self, name: str, rows: int) -> None:
+        with self._lock:
+            self._entry(name)["rows"] += rows
+
+    def set_value(self, name: str, value: float) -> None:
+        with self._lock:
+            self.values[name] = value
+
+    def count_round_trip(self) -> None:
+        stack = getattr(self._local, "stack", None)
+        with self._lock:
+            self.round_trips += 1
+            if stack:
+                self._entry(stack[-1])["round_trips"] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = {}
+            for name, entry in self.phases.items():
+                phases[name] = dict(entry)
+                if entry["rows"] and entry["seconds"] > 0:
+                    phases[name]["rows_per_second"] = entry["rows"] / entry["seconds"]
+            return {
+                "started": self.started,
+                "elapsed_seconds": time.time() - self.started,
+                "peak_rss_bytes": peak_rss_bytes(),
+                "round_trips": self.round_trips,
+                "values": dict(self.values),
+                "phases": phases,
+            }
+
+
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# PyMySQL connection that reports every command sent to the server to the run metrics
+class CountingConnection(pymysql.connections.Connection):
+    def _execute_command(self, command: int, sql: Any) -> None:
+        metrics.count_round_trip()
+        return super()._execute_command(command, sql)
+
+
+@contextlib.contextmanager
+def _atomic_file(path: str) -> Iterator[str]:
+    # Readers may look at any moment; never let them see a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".burster-")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_atomic(path: str, text: str) -> None:
+    with _atomic_file(path) as tmp_path, open(tmp_path, "w") as f:
+        f.write(text)
+
+
+def _prom_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_prometheus(summary: Dict[str, Any]) -> str:
+    lines: List[str] = []
+
+    def metric(name: str, help_text: str, samples: List[Tuple[str, float]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value!r}")
+
+    for name, help_text, value in (
+        ("timestamp_seconds", "Unix time the last run started.", summary["started"]),
+        ("success", "1 if the last run completed, 0 if it failed.", int(summary["success"])),
+        ("duration_seconds", "Wall time of the last run.", summary["elapsed_seconds"]),
+        ("peak_rss_bytes", "Peak resident set size of the last run.", summary["peak_rss_bytes"]),
+        ("db_round_trips", "Commands sent to MySQL during the last run.", summary["round_trips"]),
+    ):
+        metric(f"burster_last_run_{name}", help_text, [("", value)])
+    for name, value in sorted(summary["values"].items()):
+        metric(f"burster_{name}", f"{name} of the last run.", [("", value)])
+
+    phases = summary["phases"]
+    for key, name, help_text in (
+        ("seconds", "burster_phase_duration_seconds", "Time spent in each phase of the last run."),
+        ("calls", "burster_phase_calls", "Times each phase ran in the last run."),
+        ("rows", "burster_phase_rows", "Rows handled by each phase of the last run."),
+        ("rows_per_second", "burster_phase_rows_per_second", "Row throughput of each phase."),
+        ("round_trips", "burster_phase_db_round_trips", "Commands sent to MySQL by each phase."),
+        ("peak_rss_bytes", "burster_phase_peak_rss_bytes", "Peak resident set size after each phase."),
+    ):
+        samples = [
+            (f'{{phase="{_prom_label(phase)}"}}', entry[key])
+            for phase, entry in phases.items()
+            if key in entry
+        ]
+        if samples:
+            metric(name, help_text, samples)
+    return "\n".join(lines) + "\n"
+
+
+def write_run_metrics(config: configparser.RawConfigParser, success: bool) -> None:
+    textfile_path, json_path = get_metrics_paths(config)
+    if not textfile_path and not json_path:
+        return
+    summary = metrics.as_dict()
+    summary["success"] = success
+    try:
+        if textfile_path:
+            _write_atomic(textfile_path, format_prometheus(summary))
+        if json_path:
+            _write_atomic(json_path, json.dumps(summary, indent=2) + "\n")
+    except OSError as e:
+        # Losing the metrics must never fail an otherwise good run
+        logging.getLogger("burster").warning("Could not write run metrics: %s", e)
+
+
+metrics = RunMetrics()
+
+
+# Bounded pool of open connections to one DSN, shared by every phase of a run
+class ConnectionPool:
+    def __init__(
+        self,
+        creds: Dict[str, str],
+        size: int = 4,
+        ping_interval: float = 30.0,
+        timeout: float = 60.0,
+        autocommit: Any = None,
+        unique_checks: Any = None,
+        foreign_key_checks: Any = None,
+        local_infile: bool = False,
+        connect: Optional[Callable[..., Any]] = None,
+    ) -> None:
+        self.creds = creds
+        self.connect = connect or CountingConnection
+        self.local_infile = local_infile
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self.autocommit = autocommit
+        self.session_vars = {
+            key: int(value)
+            for key, value in (
+                ("unique_checks", unique_checks),
+                ("foreign_key_checks", foreign_key_checks),
+            )
+            if value is not None
+        }
+        self._slots = threading.BoundedSemaphore(max(1, size))
+        self._idle: "queue.LifoQueue[Tuple[Any, float]]" = queue.LifoQueue()
+
+    def _connect(self) -> Any:
+        con = self.connect(
+            host=self.creds["host"],
+            port=int(self.creds["port"]),
+            db=self.creds["db"],
+            user=self.creds["user"],
+            password=self.creds["pass"],
+            local_infile=self.local_infile,
+        )
+        if self.autocommit is not None:
+            con.autocommit(self.autocommit)
+        if self.session_vars:
+            cur = con.cursor()
+            cur.execute(
+                "SET SESSION "
+                + ", ".join(f"{key}={value}" for key, value in self.session_vars.items())
+                + ";"
+            )
+            cur.close()
+        return con
+
+    def _checkout(self) -> Any:
+        while True:
+            try:
+                con, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < self.ping_interval:
+                return con
+            try:
+                con.ping(reconnect=False)
+                return con
+            except mdb.Error:
+                self._discard(con)
+
+    @staticmethod
+    def _discard(con: Any) -> None:
+        try:
+            con.close()
+        except mdb.Error:
+            pass
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[Any]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f"Timed out waiting for a {self.creds['db']} connection")
+        con = None
+        try:
+            con = self._checkout()
+            yield con
+        except BaseException:
+            # Connection state is unknown after a failure; never hand it out again
+            if con is not None:
+                self._discard(con)
+                con = None
+            raise
+        finally:
+            if con is not None:
+                self._idle.put((con, time.monotonic()))
+            self._slots.release()
+
+    def close(self) -> None:
+        while True:
+            try:
+                con, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(con)
+
+
+_pools: Dict[Tuple[str, ...], ConnectionPool] = {}
+_load_data_unavailable = False
+_pools_lock = threading.Lock()
+_connector: Optional[Callable[..., Any]] = None
+
+
+def set_connector(connect: Optional[Callable[..., Any]]) -> None:
+    # Swap the DB-API connect() used by new pools, e.g. for a benchmark stand-in; None restores MySQL
+    global _connector
+    close_pools()
+    _connector = connect
+
+
+def get_pool(config: configparser.RawConfigParser, section: str) -> ConnectionPool:
+    creds = get_db_creds(config, section)
+    # Keyed by DSN too: every RADIUS DB target is [raddb] in its own target_config
+    key = (section, creds["host"], creds["port"], creds["db"], creds["user"])
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                creds,
+                connect=_connector,
+                **get_pool_config(config, section),
+            )
+        return _pools[key]
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# The only plan columns burster reads, in the order every plan source yields them
+class PlanRow(NamedTuple):
+    PLAN: Any
+    UL: Any
+    DL: Any
+
+
+PLAN_COLUMNS = list(PlanRow._fields)
+
+
+def iter_csv_file(filename: str) -> Iterator[PlanRow]:
     with open(filename, newline="") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            rows.append(row)
-    return rows
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        missing = [column for column in PLAN_COLUMNS if column not in header]
+        if missing:
+            raise RuntimeError(f"{filename}: missing plan columns: {', '.join(missing)}")
+        indexes = [header.index(column) for column in PLAN_COLUMNS]
+        for fields in reader:
+            if fields:
+                yield PlanRow._make(fields[index] for index in indexes)
+
+
+def read_csv_file(filename: str) -> List[PlanRow]:
+    return list(iter_csv_file(filename))
 
 
-def calc_mt_rate_limit(row: Dict[str, Any], perc: int, main_config: Dict[str, Any]) -> str:
+def calc_mt_rate_limit(row: PlanRow, perc: int, main_config: Dict[str, Any]) -> str:
     ul_rate: Dict[str, Any] = {}
     dl_rate: Dict[str, Any] = {}
     sbp = float(main_config["sbp"])
     burst_period = float(main_config["burst_period"])
     boost_perc = float(main_config["boost_perc"]) / 100.0
 
-    ul_rate["base"] = float(row["UL"]) * 1000 * (1 + boost_perc)
-    dl_rate["base"] = float(row["DL"]) * 1000 * (1 + boost_perc)
+    ul_rate["base"] = float(row.UL) * 1000 * (1 + boost_perc)
+    dl_rate["base"] = float(row.DL) * 1000 * (1 + boost_perc)
 
     if int(perc) >= 100:
         ul_rate["max"] = int(ul_rate["base"] * (float(perc) / 100))
@@ -140,131 +660,788 @@ def calc_mt_rate_limit(row: Dict[str, Any], perc: int, main_config: Dict[str, An
     )
 
 
-def update_raddb(row: Dict[str, Any], perc: int, raddb_config: Dict[str, Any], main_config: Dict[str, Any]) -> None:
-    mt_rate_limit_str = calc_mt_rate_limit(row, perc, main_config)
-    update_dict = {"mtratestr": mt_rate_limit_str, "groupname": row["PLAN"]}
-    con = None
-    try:
-        con = mdb.connect(
-            host=raddb_config["host"],
-            db=raddb_config["db"],
-            user=raddb_config["user"],
-            password=raddb_config["pass"],
+class SpeedTierValues(NamedTuple):
+    mt_rate_limit: str
+    ne_ul: str
+    ne_dl: str
+    cambium_ul: str
+    cambium_dl: str
+
+
+def calc_speed_tier_values(
+    row: PlanRow, perc: int, main_config: Dict[str, Any]
+) -> SpeedTierValues:
+    return SpeedTierValues(
+        calc_mt_rate_limit(row, perc, main_config),
+        str(int(float(row.UL) * 1_000_000 * (1 + (float(main_config["boost_perc"]) / 100)))),
+        str(int(float(row.DL) * 1_000_000 * (1 + (float(main_config["boost_perc"]) / 100)))),
+        str(int(float(row.UL) * 1000 * (1 + (float(main_config["boost_perc"]) / 100)))),
+        str(int(float(row.DL) * 1000 * (1 + (float(main_config["boost_perc"]) / 100)))),
+    )
+
+
+# LRU of speed-derived value strings keyed by (UL, DL, percent, sbp, burst_period, boost_perc);
+# plans on the same speed tier share one immutable set of strings
+class SpeedTierCache:
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[float, ...], SpeedTierValues]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, row: PlanRow, perc: int, main_config: Dict[str, Any]) -> SpeedTierValues:
+        key = (
+            float(row.UL),
+            float(row.DL),
+            float(perc),
+            float(main_config["sbp"]),
+            float(main_config["burst_period"]),
+            float(main_config["boost_perc"]),
         )
-        cur = con.cursor()
-        cur.execute(
-            """
-            UPDATE radgroupreply
-            SET value=%(mtratestr)s
-            WHERE groupname=%(groupname)s AND attribute='Mikrotik-Rate-Limit';
-            """,
-            update_dict,
+        with self._lock:
+            values = self._entries.get(key)
+            if values is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return values
+            self.misses += 1
+        values = calc_speed_tier_values(row, perc, main_config)
+        with self._lock:
+            self._entries[key] = values
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return values
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_stats(self, hits: int, misses: int) -> None:
+        # Lookups made by another process's cache on our behalf
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def log_stats(self, logger: logging.Logger) -> None:
+        lookups = self.hits + self.misses
+        logger.info(
+            "Speed tier cache: %d hits, %d misses (%.0f%% hit rate), %d entries",
+            self.hits,
+            self.misses,
+            (self.hits / lookups) * 100 if lookups else 0.0,
+            len(self),
         )
+
+
+def plans_query(
+    config: configparser.RawConfigParser, select: str, condition: Optional[str] = None, params_bound: bool = False
+) -> str:
+    plans_filter = get_plans_filter(config)
+    if plans_filter and params_bound:
+        # The driver %-formats queries that carry parameters, so a literal % must be doubled
+        plans_filter = plans_filter.replace("%", "%%")
+    conditions = [c for c in (plans_filter, condition) if c]
+    query = f"SELECT {select} FROM {get_plans_table(config)}"
+    if conditions:
+        query += " WHERE " + " AND ".join(f"({c})" for c in conditions)
+    return query
+
+
+def read_plan_table(
+    config: configparser.RawConfigParser,
+    plans: Optional[List[str]] = None,
+    where: Optional[str] = None,
+) -> List[PlanRow]:
+    plans_file = get_plans_file(config)
+    if plans_file:
+        if where:
+            print("Error: --where filters the plans table; it cannot be used with a plans file")
+            sys.exit(1)
+        try:
+            with metrics.phase("read_plan_table"):
+                rows = read_csv_file(plans_file)
+                if plans:
+                    wanted = set(plans)
+                    rows = [row for row in rows if row.PLAN in wanted]
+            metrics.add_rows("read_plan_table", len(rows))
+            return rows
+        except OSError as e:
+            print("Error: {}".format(e))
+            sys.exit(1)
+
+    condition, params = where, []
+    if plans:
+        condition = f"PLAN IN ({', '.join(['%s'] * len(plans))})"
+        params = list(plans)
+    # Operator-supplied SQL (--where, plans_filter) is used as is
+    query = plans_query(config, ", ".join(PLAN_COLUMNS), condition, params_bound=bool(params))
+    try:
+        with metrics.phase("read_plan_table"), get_pool(config, "bbdb").connection() as con:
+            cur = con.cursor()
+            cur.execute(query + ";", params or None)
+            rows = [PlanRow._make(row) for row in cur.fetchall()]
+            con.commit()
+            metrics.add_rows("read_plan_table", len(rows))
+            return rows
     except mdb.Error as e:
         print("Error: {}".format(e))
         sys.exit(1)
-    finally:
-        if con:
-            con.commit()
-            con.close()
 
+def iter_plan_chunks(
+    config: configparser.RawConfigParser, chunk_size: int
+) -> Iterator[List[PlanRow]]:
+    plans_file = get_plans_file(config)
+    if plans_file:
+        try:
+            rows = iter_csv_file(plans_file)
+            while True:
+                with metrics.phase("read_plan_table"):
+                    chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                metrics.add_rows("read_plan_table", len(chunk))
+                yield chunk
+        except OSError as e:
+            print("Error: {}".format(e))
+            sys.exit(1)
+        return
 
-def read_plan_table(config: configparser.RawConfigParser) -> List[Dict[str, Any]]:
-    bbdb_creds = get_bbdb_creds(config)
-    con = None
     try:
-        con = mdb.connect(
-            host=bbdb_creds["host"],
-            db=bbdb_creds["db"],
-            user=bbdb_creds["user"],
-            password=bbdb_creds["pass"],
-        )
-        cur = con.cursor(mdb.cursors.DictCursor)
-        cur.execute("SELECT * FROM plans;")
-        rows = cur.fetchall()
-        return list(rows)
+        with get_pool(config, "bbdb").connection() as con:
+            # Unbuffered cursor: rows stay on the server until fetched
+            cur = con.cursor(mdb.cursors.SSCursor)
+            cur.execute(plans_query(config, ", ".join(PLAN_COLUMNS)) + ";")
+            while True:
+                with metrics.phase("read_plan_table"):
+                    chunk = [PlanRow._make(row) for row in cur.fetchmany(chunk_size)]
+                if not chunk:
+                    break
+                metrics.add_rows("read_plan_table", len(chunk))
+                yield chunk
+            cur.close()
+            con.commit()
     except mdb.Error as e:
         print("Error: {}".format(e))
         sys.exit(1)
-    finally:
-        if con:
-            con.commit()
-            con.close()
 
-def create_temp_tables(config: configparser.RawConfigParser) -> None:
-    raddb_creds = get_raddb_creds(config)
-    con = None
-    try:
-        con = mdb.connect(
-            host=raddb_creds["host"],
-            db=raddb_creds["db"],
-            user=raddb_creds["user"],
-            password=raddb_creds["pass"],
+
+def checksum_sql(columns: List[str]) -> str:
+    return f"COALESCE(SUM(CRC32(CONVERT(CONCAT_WS('|', {', '.join(columns)}) USING utf8mb4))), 0)"
+
+
+def table_fingerprints(cur: Any, table_names: List[str], columns: List[str]) -> Dict[str, Tuple[int, int]]:
+    # Row count plus an order-independent hash over `columns` per table, computed server side in one
+    # query; hashing the utf8mb4 bytes makes it independent of the column charset
+    checksum = checksum_sql(columns)
+    cur.execute(
+        " UNION ALL ".join(
+            f"SELECT '{table_name}', COUNT(*), {checksum} FROM {table_name}" for table_name in table_names
         )
+        + ";"
+    )
+    return {row[0]: (int(row[1]), int(row[2])) for row in cur.fetchall()}
+
+
+def table_fingerprint(cur: Any, table_name: str, columns: List[str]) -> Tuple[int, int]:
+    return table_fingerprints(cur, [table_name], columns)[table_name]
+
+
+def records_fingerprint(records: Iterable[Tuple[str, ...]]) -> Tuple[int, int]:
+    # Client-side twin of table_fingerprint
+    count = checksum = 0
+    for record in records:
+        count += 1
+        checksum += zlib.crc32("|".join(record).encode("utf-8"))
+    return count, checksum
+
+
+def plans_fingerprint(config: configparser.RawConfigParser) -> Tuple[int, int]:
+    # Only the rows and columns burster reads; anything else changing is not a reason to rebuild
+    plans_file = get_plans_file(config)
+    if plans_file:
+        return records_fingerprint(read_csv_file(plans_file))
+    with get_pool(config, "bbdb").connection() as con:
         cur = con.cursor()
-        cur.execute("DROP TABLE IF EXISTS radgroupcheck_tmp;")
+        cur.execute(plans_query(config, f"COUNT(*), {checksum_sql(PLAN_COLUMNS)}") + ";")
+        count, checksum = cur.fetchone()
+        cur.close()
+        # End the read view, or a pooled connection would keep seeing the same snapshot
         con.commit()
-        cur.execute("DROP TABLE IF EXISTS radgroupreply_tmp;")
-        con.commit()
-        cur.execute("CREATE TABLE radgroupcheck_tmp LIKE radgroupcheck_template;")
-        con.commit()
-        cur.execute("CREATE TABLE radgroupreply_tmp LIKE radgroupreply_template;")
+    return int(count), int(checksum)
+
+
+def tier_table(table_name: str, perc: int) -> str:
+    return f"{table_name}_tier{perc}"
+
+
+def staging_tables(tiers: List[int]) -> List[Tuple[str, str]]:
+    # (radgroupcheck, radgroupreply) staging table pairs: the _tmp pair for tiers[0], then one pair per extra tier
+    pairs = [("radgroupcheck_tmp", "radgroupreply_tmp")]
+    for perc in tiers[1:]:
+        pairs.append((tier_table("radgroupcheck", perc), tier_table("radgroupreply", perc)))
+    return pairs
+
+
+def _list_radgroup_tables(cur: Any) -> Dict[str, str]:
+    cur.execute(
+        "SELECT TABLE_NAME, TABLE_COMMENT FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME LIKE 'radgroup%';"
+    )
+    return {row[0]: row[1] or "" for row in cur.fetchall()}
+
+
+def _table_tier(comment: str) -> Optional[int]:
+    match = TIER_COMMENT_RE.match(comment)
+    return int(match.group(1)) if match else None
+
+
+def drop_staged_tiers(cur: Any) -> None:
+    # Tiers staged by an earlier run were built from older plans; never leave them activatable
+    stale = [name for name in _list_radgroup_tables(cur) if TIER_TABLE_RE.match(name)]
+    if stale:
+        cur.execute(f"DROP TABLE IF EXISTS {', '.join(stale)};")
+
+
+def retag_live_tables(con: Any, cur: Any, perc: int) -> None:
+    # Once rows were rewritten in place: --activate-tier and --plans read the live tier from the comment
+    for table_name in LIVE_TABLES:
+        cur.execute(f"ALTER TABLE {table_name} COMMENT='{TIER_COMMENT_PREFIX}{perc}';")
         con.commit()
+
+
+# (index name, unique, index type, ((column, prefix length, collation), ...)) per index, by name
+IndexDefinitions = Dict[str, Tuple[bool, str, Tuple[Tuple[Optional[str], Optional[int], Optional[str]], ...]]]
+
+
+def read_index_definitions(cur: Any, table_name: str) -> IndexDefinitions:
+    cur.execute(
+        "SELECT INDEX_NAME, NON_UNIQUE, INDEX_TYPE, COLUMN_NAME, SUB_PART, COLLATION "
+        "FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+        "ORDER BY INDEX_NAME, SEQ_IN_INDEX;",
+        (table_name,),
+    )
+    indexes: IndexDefinitions = OrderedDict()
+    for name, non_unique, index_type, column, sub_part, collation in cur.fetchall():
+        unique, _, parts = indexes.get(name, (not int(non_unique), index_type, ()))
+        sub_part = int(sub_part) if sub_part is not None else None
+        indexes[name] = (unique, index_type, parts + ((column, sub_part, collation),))
+    return indexes
+
+
+def read_table_schema(cur: Any, table_name: str) -> Tuple[Any, ...]:
+    # Everything about a table that staging must reproduce from its template (not its name or comment)
+    cur.execute(
+        "SELECT ENGINE, TABLE_COLLATION FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s;",
+        (table_name,),
+    )
+    table = tuple(cur.fetchall())
+    cur.execute(
+        "SELECT COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_DEFAULT, EXTRA, COLLATION_NAME "
+        "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+        "ORDER BY ORDINAL_POSITION;",
+        (table_name,),
+    )
+    columns = tuple(cur.fetchall())
+    return table, columns, dict(read_index_definitions(cur, table_name))
+
+
+def deferrable_indexes(cur: Any, template: str) -> IndexDefinitions:
+    logger = logging.getLogger("burster")
+    secondary = OrderedDict(
+        (name, definition)
+        for name, definition in read_index_definitions(cur, template).items()
+        if name != "PRIMARY"
+    )
+    for name, (_, _, parts) in secondary.items():
+        if any(column is None for column, _, _ in parts):
+            # Functional index parts cannot be rebuilt from information_schema; keep them inline
+            logger.warning("%s index %s has expression parts; not deferring its indexes", template, name)
+            return OrderedDict()
+    return secondary
+
+
+def _add_index_clause(name: str, definition: Tuple[bool, str, Tuple[Any, ...]]) -> str:
+    unique, index_type, parts = definition
+    if index_type in ("FULLTEXT", "SPATIAL"):
+        kind = f"{index_type} INDEX"
+    else:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+    columns = ", ".join(
+        f"`{column}`" + (f"({sub_part})" if sub_part else "") + (" DESC" if collation == "D" else "")
+        for column, sub_part, collation in parts
+    )
+    return f"ADD {kind} `{name}` ({columns})"
+
+
+def create_temp_tables(
+    config: configparser.RawConfigParser,
+    tiers: Optional[List[int]] = None,
+    defer_indexes: bool = False,
+) -> None:
+    tiers = tiers or []
+    try:
+        with metrics.phase("create_temp_tables"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            drop_staged_tiers(cur)
+            cur.execute("DROP TABLE IF EXISTS radgroupcheck_tmp;")
+            con.commit()
+            cur.execute("DROP TABLE IF EXISTS radgroupreply_tmp;")
+            con.commit()
+            deferred = {
+                template: deferrable_indexes(cur, template) if defer_indexes else {}
+                for template in ("radgroupcheck_template", "radgroupreply_template")
+            }
+            for idx, (check_table, reply_table) in enumerate(staging_tables(tiers)):
+                cur.execute(f"CREATE TABLE {check_table} LIKE radgroupcheck_template;")
+                con.commit()
+                cur.execute(f"CREATE TABLE {reply_table} LIKE radgroupreply_template;")
+                con.commit()
+                for table_name, template in (
+                    (check_table, "radgroupcheck_template"),
+                    (reply_table, "radgroupreply_template"),
+                ):
+                    if deferred[template]:
+                        # Load into a table with only its primary key; build_staged_indexes adds the rest
+                        drops = ", ".join(f"DROP INDEX `{name}`" for name in deferred[template])
+                        cur.execute(f"ALTER TABLE {table_name} {drops};")
+                        con.commit()
+                if tiers:
+                    # The comment travels with the table through renames, so the live tier is always known
+                    for table_name in (check_table, reply_table):
+                        cur.execute(f"ALTER TABLE {table_name} COMMENT='{TIER_COMMENT_PREFIX}{tiers[idx]}';")
+                        con.commit()
     except mdb.Error as e:
         print("Error: {}".format(e))
         sys.exit(1)
-    finally:
-        if con:
+
+
+def build_staged_indexes(config: configparser.RawConfigParser, tiers: Optional[List[int]] = None) -> None:
+    logger = logging.getLogger("burster")
+    try:
+        with metrics.phase("build_indexes"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            for check_table, reply_table in staging_tables(tiers or []):
+                for table_name, template in (
+                    (check_table, "radgroupcheck_template"),
+                    (reply_table, "radgroupreply_template"),
+                ):
+                    existing = read_index_definitions(cur, table_name)
+                    missing = OrderedDict(
+                        (name, definition)
+                        for name, definition in deferrable_indexes(cur, template).items()
+                        if name not in existing
+                    )
+                    if missing:
+                        # One ALTER builds every index from a single pass over the loaded rows
+                        started = time.perf_counter()
+                        clauses = ", ".join(_add_index_clause(name, d) for name, d in missing.items())
+                        cur.execute(f"ALTER TABLE {table_name} {clauses};")
+                        logger.info(
+                            "Built %d index(es) on %s in %.2fs",
+                            len(missing),
+                            table_name,
+                            time.perf_counter() - started,
+                        )
+                    if read_table_schema(cur, table_name) != read_table_schema(cur, template):
+                        raise RuntimeError(f"{table_name} does not match the schema of {template}")
             con.commit()
-            con.close()
+    except (mdb.Error, RuntimeError) as e:
+        # The live tables are untouched; the staging tables are recreated by the next run
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+
+def sort_frame_by_group(frame: AttributeFrame) -> AttributeFrame:
+    # Stable, so every group keeps its rows in their original order
+    if isinstance(frame, AttributeBuffers):
+        return frame.sorted_by_group()
+    return frame.sort_values("groupname", kind="stable", ignore_index=True)
+
+
+def swap_tables(
+    cur: Any,
+    incoming: Dict[str, str],
+    outgoing: Dict[str, str],
+    retiring: Optional[Dict[str, str]] = None,
+) -> float:
+    # incoming maps live table -> table to put in its place, outgoing maps live table -> name it moves to;
+    # retiring renames ride along in the same statement
+    existing = _list_radgroup_tables(cur)
+    renames = [f"{old} TO {new}" for old, new in (retiring or {}).items()]
+    for live_table, source_table in incoming.items():
+        if live_table in existing:
+            renames.append(f"{live_table} TO {outgoing[live_table]}")
+        renames.append(f"{source_table} TO {live_table}")
+    # One RENAME moves every table atomically, so lookups never see a missing table
+    started = time.perf_counter()
+    cur.execute(f"RENAME TABLE {', '.join(renames)};")
+    held = time.perf_counter() - started
+    metrics.set_value("swap_lock_seconds", held)
+    return held * 1000
+
+
+def generation_table(table_name: str, stamp: str) -> str:
+    return f"{table_name}_gen_{stamp}"
+
+
+def generation_order(stamp: str) -> Tuple[str, int]:
+    timestamp, _, sequence = stamp.partition("_")
+    return timestamp, int(sequence or 0)
+
+
+def list_generations(tables: Dict[str, str]) -> List[str]:
+    # Stamps of the retained generations that have both tables, newest first
+    found: Dict[str, set] = defaultdict(set)
+    for name in tables:
+        match = GENERATION_TABLE_RE.match(name)
+        if match:
+            found[match.group(2)].add(match.group(1))
+    return sorted(
+        (stamp for stamp, names in found.items() if len(names) == len(LIVE_TABLES)),
+        key=generation_order,
+        reverse=True,
+    )
+
+
+def retire_live_tables(
+    tables: Dict[str, str], generations: List[str], keep: int
+) -> Tuple[Dict[str, str], Dict[str, str], List[str]]:
+    # Where the replaced live tables go (a new generation, or *_old when none are kept), the renames
+    # that retire generations beyond `keep`, and the tables to drop once the swap is done
+    if keep <= 0:
+        outgoing = {table_name: f"{table_name}_old" for table_name in LIVE_TABLES}
+        # Generations kept under an earlier setting go too
+        kept = [generation_table(table_name, stamp) for stamp in generations for table_name in LIVE_TABLES]
+        return outgoing, {}, list(outgoing.values()) + kept
+    # Stamps order the generations, so a new one always sorts after every existing one
+    stamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    stamps = [match.group(2) for match in map(GENERATION_TABLE_RE.match, tables) if match]
+    if stamps:
+        newest, sequence = max(map(generation_order, stamps))
+        if newest >= stamp:
+            # A second deploy within the same second (or a clock that went back) keeps the newest timestamp
+            stamp = f"{newest}_{sequence + 1}"
+    outgoing = {table_name: generation_table(table_name, stamp) for table_name in LIVE_TABLES}
+    # The live tables become the newest generation, so keep - 1 of the existing ones stay
+    live = any(table_name in tables for table_name in LIVE_TABLES)
+    retiring = {
+        generation_table(table_name, old_stamp): f"{table_name}_old_{old_stamp}"
+        for old_stamp in generations[keep - 1 if live else keep:]
+        for table_name in LIVE_TABLES
+    }
+    # Leftovers of a retirement whose drop never finished
+    leftovers = [name for name in tables if RETIRED_TABLE_RE.match(name)]
+    return outgoing, retiring, list(retiring.values()) + leftovers
+
+
+def swap_temp_tables(config: configparser.RawConfigParser) -> Optional[threading.Thread]:
+    to_drop = swap_in_staged_tables(config)
+    return drop_tables_in_background(config, to_drop) if to_drop else None
+
 
-def swap_temp_tables(config: configparser.RawConfigParser) -> None:
-    raddb_creds = get_raddb_creds(config)
-    con = None
+def swap_in_staged_tables(config: configparser.RawConfigParser) -> List[str]:
+    # Returns the replaced or retired tables, which are left for the caller to drop
+    logger = logging.getLogger("burster")
+    keep = get_keep_generations(config)
     try:
-        con = mdb.connect(
-            host=raddb_creds["host"],
-            db=raddb_creds["db"],
-            user=raddb_creds["user"],
-            password=raddb_creds["pass"],
-        )
-        cur = con.cursor()
-        cur.execute("DROP TABLE radgroupcheck;")
-        con.commit()
-        cur.execute("DROP TABLE radgroupreply;")
-        con.commit()
-        cur.execute("RENAME TABLE radgroupcheck_tmp TO radgroupcheck;")
-        con.commit()
-        cur.execute("RENAME TABLE radgroupreply_tmp TO radgroupreply;")
-        con.commit()
+        with metrics.phase("swap_temp_tables"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            cur.execute("DROP TABLE IF EXISTS radgroupcheck_old, radgroupreply_old;")
+            tables = _list_radgroup_tables(cur)
+            outgoing, retiring, to_drop = retire_live_tables(tables, list_generations(tables), keep)
+            held_ms = swap_tables(
+                cur,
+                {"radgroupcheck": "radgroupcheck_tmp", "radgroupreply": "radgroupreply_tmp"},
+                outgoing,
+                retiring,
+            )
+            logger.info("Swapped tables in one RENAME; metadata locks held for %.1f ms", held_ms)
     except mdb.Error as e:
         print("Error: {}".format(e))
         sys.exit(1)
-    finally:
-        if con:
+    return to_drop
+
+
+def rollback_generation(config: configparser.RawConfigParser, steps: int = 1) -> Optional[threading.Thread]:
+    # Renames the generation that was live `steps` deploys ago back into place; the tables it
+    # replaces become the newest generation, so rolling back by 1 twice is a no-op
+    logger = logging.getLogger("burster")
+    keep = get_keep_generations(config)
+    try:
+        with metrics.phase("rollback"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            tables = _list_radgroup_tables(cur)
+            generations = list_generations(tables)
+            if len(generations) < steps:
+                print(
+                    f"Error: cannot roll back {steps} generation(s): {len(generations)} retained "
+                    "(set BURSTER_KEEP_GENERATIONS to keep previous tables)"
+                )
+                sys.exit(1)
+            stamp = generations[steps - 1]
+            # Staged tiers were built with the rows being rolled back
+            drop_staged_tiers(cur)
+            cur.execute("DROP TABLE IF EXISTS radgroupcheck_old, radgroupreply_old;")
+            outgoing, retiring, to_drop = retire_live_tables(
+                tables, [g for g in generations if g != stamp], max(keep, 1)
+            )
+            held_ms = swap_tables(
+                cur,
+                {table_name: generation_table(table_name, stamp) for table_name in LIVE_TABLES},
+                outgoing,
+                retiring,
+            )
+            logger.info(
+                "Rolled back to generation %s (%d deploy(s) ago); metadata locks held for %.1f ms",
+                stamp,
+                steps,
+                held_ms,
+            )
+    except mdb.Error as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+    return drop_tables_in_background(config, to_drop) if to_drop else None
+
+
+def restore_swapped_tables(config: configparser.RawConfigParser) -> None:
+    # Undoes swap_in_staged_tables before its replaced tables are dropped: they are radgroup*_old,
+    # or the newest generation when generations are kept
+    try:
+        with get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            existing = _list_radgroup_tables(cur)
+            generations = list_generations(existing) if get_keep_generations(config) > 0 else []
+            renames = []
+            for live_table in LIVE_TABLES:
+                previous = generation_table(live_table, generations[0]) if generations else f"{live_table}_old"
+                renames.append(f"{live_table} TO {live_table}_tmp")
+                if previous in existing:
+                    renames.append(f"{previous} TO {live_table}")
+            # Generations the swap retired become generations again
+            renames.extend(
+                f"{name} TO {name.replace('_old_', '_gen_')}" for name in existing if RETIRED_TABLE_RE.match(name)
+            )
+            cur.execute(f"RENAME TABLE {', '.join(renames)};")
+            # Tiers staged by this run belong to rows that are not live here
+            drop_staged_tiers(cur)
             con.commit()
-            con.close()
+    except mdb.Error as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+
+def activate_tier(config: configparser.RawConfigParser, perc: int) -> Optional[threading.Thread]:
+    logger = logging.getLogger("burster")
+    incoming = {
+        "radgroupcheck": tier_table("radgroupcheck", perc),
+        "radgroupreply": tier_table("radgroupreply", perc),
+    }
+    to_drop: List[str] = []
+    try:
+        with metrics.phase("activate_tier"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            tables = _list_radgroup_tables(cur)
+            live_tier = _table_tier(tables.get("radgroupreply", ""))
+            if live_tier == perc:
+                logger.info("Tier %d is already active", perc)
+                return None
+            missing = [name for name in incoming.values() if name not in tables]
+            if missing:
+                print(f"Error: tier {perc} is not staged (missing {', '.join(missing)}); stage it with --percent")
+                sys.exit(1)
+
+            # Park the live tables as their own tier so they can be switched back to
+            outgoing: Dict[str, str] = {}
+            for live_table in incoming:
+                tier = _table_tier(tables.get(live_table, ""))
+                if tier is not None and tier_table(live_table, tier) not in tables:
+                    outgoing[live_table] = tier_table(live_table, tier)
+                else:
+                    outgoing[live_table] = f"{live_table}_old"
+                    to_drop.append(f"{live_table}_old")
+            if to_drop:
+                cur.execute(f"DROP TABLE IF EXISTS {', '.join(to_drop)};")
+            held_ms = swap_tables(cur, incoming, outgoing)
+            logger.info(
+                "Activated tier %d (was %s); metadata locks held for %.1f ms",
+                perc,
+                live_tier if live_tier is not None else "unknown",
+                held_ms,
+            )
+    except mdb.Error as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+    return drop_tables_in_background(config, to_drop) if to_drop else None
+
+
+def drop_tables_in_background(
+    config: configparser.RawConfigParser, table_names: List[str]
+) -> threading.Thread:
+    def _drop() -> None:
+        logger = logging.getLogger("burster")
+        try:
+            with get_pool(config, "raddb").connection() as con:
+                cur = con.cursor()
+                started = time.perf_counter()
+                cur.execute(f"DROP TABLE IF EXISTS {', '.join(table_names)};")
+                logger.info(
+                    "Dropped %s in %.1f ms",
+                    ", ".join(table_names),
+                    (time.perf_counter() - started) * 1000,
+                )
+        except mdb.Error as e:
+            logger.warning("Could not drop %s: %s", ", ".join(table_names), e)
+
+    thread = threading.Thread(target=_drop, name="burster-drop")
+    thread.start()
+    return thread
+
+
+class TargetResult(NamedTuple):
+    target: str
+    seconds: float
+    value: Any
+    error: Optional[str]
+
+
+def fan_out(
+    config: configparser.RawConfigParser,
+    targets: List[str],
+    phase: str,
+    step: Callable[[configparser.RawConfigParser], Any],
+) -> List[TargetResult]:
+    # Runs step against every RADIUS DB target at once; a failure never stops the other targets
+    def _run(section: str) -> TargetResult:
+        started = time.perf_counter()
+        try:
+            with metrics.phase(f"{phase}:{target_name(section)}"):
+                value = step(target_config(config, section))
+        except SystemExit as e:
+            # The step has already printed why
+            return TargetResult(section, time.perf_counter() - started, None, f"exited with status {e.code}")
+        except Exception as e:
+            return TargetResult(section, time.perf_counter() - started, None, str(e) or type(e).__name__)
+        return TargetResult(section, time.perf_counter() - started, value, None)
+
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="burster-target") as executor:
+        return list(executor.map(_run, targets))
+
+
+def log_target_results(results: List[TargetResult], action: str) -> List[str]:
+    # Returns the targets that failed
+    logger = logging.getLogger("burster")
+    failed = []
+    for result in results:
+        if result.error is None:
+            logger.info("%s: %s done in %.2fs", target_name(result.target), action, result.seconds)
+        else:
+            logger.error(
+                "%s: %s failed after %.2fs: %s",
+                target_name(result.target),
+                action,
+                result.seconds,
+                result.error,
+            )
+            failed.append(result.target)
+    return failed
+
+
+def each_target(
+    config: configparser.RawConfigParser,
+    targets: List[str],
+    phase: str,
+    action: str,
+    step: Callable[[configparser.RawConfigParser], Any],
+) -> List[Any]:
+    # A single target runs inline, exactly as before; several run concurrently and the run exits if any failed
+    if len(targets) == 1:
+        return [step(target_config(config, targets[0]))]
+    results = fan_out(config, targets, phase, step)
+    if log_target_results(results, action):
+        sys.exit(1)
+    return [result.value for result in results]
+
+
+def deploy_to_targets(
+    config: configparser.RawConfigParser,
+    targets: List[str],
+    frames: List[Tuple[str, AttributeFrame]],
+    tiers: List[int],
+    workers: int = 1,
+    reply_chunks: int = 1,
+    defer_indexes: bool = False,
+    fingerprints: Optional[Dict[str, Tuple[int, int]]] = None,
+) -> None:
+    # Loads the same rows into every target's staging tables concurrently, then swaps them in;
+    # exits if any target failed
+    logger = logging.getLogger("burster")
+    policy = get_fanout_policy(config)
+
+    def _stage(target: configparser.RawConfigParser) -> None:
+        create_temp_tables(target, tiers, defer_indexes)
+        load_frames(target, frames, workers, reply_chunks)
+        if defer_indexes:
+            build_staged_indexes(target, tiers)
+        if fingerprints is not None:
+            verify_staged_tables(target, fingerprints)
+
+    logger.info("Staging rows on %d RADIUS DBs (policy=%s)", len(targets), policy)
+    failed = log_target_results(fan_out(config, targets, "stage", _stage), "staging")
+    if failed and policy == "all":
+        logger.error("%d of %d targets failed to stage; no target was swapped", len(failed), len(targets))
+        metrics.set_value("targets_failed", len(failed))
+        sys.exit(1)
+
+    ready = [target for target in targets if target not in failed]
+    swap_results = fan_out(config, ready, "swap", swap_in_staged_tables)
+    swap_failed = log_target_results(swap_results, "swap")
+    swapped = [target for target in ready if target not in swap_failed]
+    if swap_failed and policy == "all":
+        # Put the old tables back where the swap already happened, so all targets keep serving the same rows
+        logger.error("%d of %d targets failed to swap; restoring the others", len(swap_failed), len(targets))
+        log_target_results(fan_out(config, swapped, "restore", restore_swapped_tables), "restore")
+        metrics.set_value("targets_failed", len(swap_failed))
+        sys.exit(1)
+
+    drops = [
+        drop_tables_in_background(target_config(config, result.target), result.value)
+        for result in swap_results
+        if result.error is None and result.value
+    ]
+    for thread in drops:
+        thread.join()
+    metrics.set_value("targets_deployed", len(swapped))
+    metrics.set_value("targets_failed", len(failed) + len(swap_failed))
+    if failed or swap_failed:
+        logger.error(
+            "Deployed to %d of %d targets; failed: %s",
+            len(swapped),
+            len(targets),
+            ", ".join(target_name(target) for target in failed + swap_failed),
+        )
+        sys.exit(1)
+
 
 def build_plan_attribute_rows(
-    row: Dict[str, Any], perc: int, main_config: Dict[str, Any]
+    row: PlanRow,
+    perc: int,
+    main_config: Dict[str, Any],
+    cache: Optional["SpeedTierCache"] = None,
 ) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
-    mt_rate_limit_str = calc_mt_rate_limit(row, perc, main_config)
-    ne_ul = str(
-        int(float(row["UL"]) * 1_000_000 * (1 + (float(main_config["boost_perc"]) / 100)))
-    )
-    ne_dl = str(
-        int(float(row["DL"]) * 1_000_000 * (1 + (float(main_config["boost_perc"]) / 100)))
-    )
-    cambium_ul = str(
-        int(float(row["UL"]) * 1000 * (1 + (float(main_config["boost_perc"]) / 100)))
-    )
-    cambium_dl = str(
-        int(float(row["DL"]) * 1000 * (1 + (float(main_config["boost_perc"]) / 100)))
-    )
+    if cache is not None:
+        speed = cache.get(row, perc, main_config)
+    else:
+        speed = calc_speed_tier_values(row, perc, main_config)
+    mt_rate_limit_str, ne_ul, ne_dl, cambium_ul, cambium_dl = speed
 
     radgroupcheck_rows = [
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "Auth-Type",
             "op": ":=",
             "value": "Local",
@@ -273,73 +1450,73 @@ def build_plan_attribute_rows(
 
     radgroupreply_rows = [
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "Session-Timeout",
             "op": ":=",
             "value": str(main_config["session_timeout"]),
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "Framed-Pool",
             "op": ":=",
             "value": str(main_config["framed_pool"]),
         },
         {
-             "groupname": row["PLAN"],
+             "groupname": row.PLAN,
              "attribute": "Mikrotik-Rate-Limit",
              "op": ":=",
              "value": mt_rate_limit_str,
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "Alc-Subsc-Prof-Str",
             "op": ":=",
-            "value": row["PLAN"],
+            "value": row.PLAN,
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "Alc-SLA-Prof-Str",
             "op": ":=",
-            "value": row["PLAN"],
+            "value": row.PLAN,
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "NetElastic-Input-Average-Rate",
             "op": ":=",
             "value": ne_ul,
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "NetElastic-Output-Average-Rate",
             "op": ":=",
             "value": ne_dl,
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "Cambium-ePMP-Max-Burst-Uplink-Rate",
             "op": ":=",
             "value": cambium_ul,
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "Cambium-ePMP-Max-Burst-Downlink-Rate",
             "op": ":=",
             "value": cambium_dl,
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "NetElastic-Lease-Time",
             "op": ":=",
             "value": str(main_config["session_timeout"]),
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "Filter-Id",
             "op": ":=",
             "value": "cst-acl-profile",
         },
         {
-            "groupname": row["PLAN"],
+            "groupname": row.PLAN,
             "attribute": "NetElastic-Portal-Mode",
             "op": ":=",
             "value": "0",
@@ -511,56 +1688,1503 @@ def append_one_off_groups(
         )
 
 
-def bulk_insert_dataframe(
-    config: configparser.RawConfigParser, table_name: str, dataframe: pd.DataFrame
+# Attribute names and ops interned per process; AttributeBuffers store 2-byte codes into _symbols
+_symbols: List[str] = []
+_symbol_codes: Dict[str, int] = {}
+_symbols_lock = threading.Lock()
+
+
+def symbol_code(symbol: str) -> int:
+    code = _symbol_codes.get(symbol)
+    if code is None:
+        with _symbols_lock:
+            code = _symbol_codes.get(symbol)
+            if code is None:
+                code = _symbol_codes[symbol] = len(_symbols)
+                _symbols.append(symbol)
+    return code
+
+
+def _restore_buffers(
+    names: List[str],
+    groups: array,
+    attribute_codes: array,
+    op_codes: array,
+    value: List[str],
+    symbols: List[str],
+) -> AttributeBuffers:
+    # Unpickles buffers built by another process, whose symbol codes may differ from ours
+    translate = [symbol_code(symbol) for symbol in symbols]
+    if translate != list(range(len(symbols))):
+        attribute_codes = array("H", map(translate.__getitem__, attribute_codes))
+        op_codes = array("H", map(translate.__getitem__, op_codes))
+    return AttributeBuffers.from_codes(names, groups, attribute_codes, op_codes, value)
+
+
+# Attribute rows in columns; the "buffers" engine builds these instead of DataFrames and the
+# loaders read them without pandas. groupname is stored as 4-byte indexes into `names`, attribute
+# and op as interned symbol codes, so a row costs 16 bytes plus its value string
+class AttributeBuffers:
+    __slots__ = ("names", "groups", "attribute_codes", "op_codes", "value")
+
+    def __init__(
+        self,
+        groupname: Optional[List[str]] = None,
+        attribute: Optional[List[str]] = None,
+        op: Optional[List[str]] = None,
+        value: Optional[List[str]] = None,
+    ) -> None:
+        self.names: List[str] = []
+        self.groups = array("I")
+        self.attribute_codes = array("H", map(symbol_code, attribute or []))
+        self.op_codes = array("H", map(symbol_code, op or []))
+        self.value = value if value is not None else []
+        self._add_groups(groupname or [])
+
+    @classmethod
+    def from_codes(
+        cls, names: List[str], groups: array, attribute_codes: array, op_codes: array, value: List[str]
+    ) -> AttributeBuffers:
+        buffers = cls.__new__(cls)
+        buffers.names = names
+        buffers.groups = groups
+        buffers.attribute_codes = attribute_codes
+        buffers.op_codes = op_codes
+        buffers.value = value
+        return buffers
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> AttributeBuffers:
+        buffers = cls()
+        buffers.extend_rows(rows)
+        return buffers
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (
+            _restore_buffers,
+            (self.names, self.groups, self.attribute_codes, self.op_codes, self.value, list(_symbols)),
+        )
+
+    def _add_groups(self, groupnames: List[str]) -> None:
+        # Consecutive rows of a group share one entry in `names`
+        names, groups = self.names, self.groups
+        for name in groupnames:
+            if not names or names[-1] != name:
+                names.append(name)
+            groups.append(len(names) - 1)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    @property
+    def empty(self) -> bool:
+        return not self.groups
+
+    @property
+    def groupname(self) -> List[str]:
+        return list(map(self.names.__getitem__, self.groups))
+
+    @property
+    def attribute(self) -> List[str]:
+        return list(map(_symbols.__getitem__, self.attribute_codes))
+
+    @property
+    def op(self) -> List[str]:
+        return list(map(_symbols.__getitem__, self.op_codes))
+
+    def columns(self) -> Dict[str, List[str]]:
+        return dict(zip(ATTRIBUTE_COLUMNS, (self.groupname, self.attribute, self.op, self.value)))
+
+    def has_group(self, groupname: str) -> bool:
+        codes = {code for code, name in enumerate(self.names) if name == groupname}
+        return bool(codes) and not codes.isdisjoint(self.groups)
+
+    def extend_rows(self, rows: List[Dict[str, Any]]) -> None:
+        self._add_groups([str(row["groupname"]) for row in rows])
+        self.attribute_codes.extend(symbol_code(str(row["attribute"])) for row in rows)
+        self.op_codes.extend(symbol_code(str(row["op"])) for row in rows)
+        self.value.extend(str(row["value"]) for row in rows)
+
+    def extend(self, other: AttributeBuffers) -> None:
+        offset = len(self.names)
+        self.names.extend(other.names)
+        if offset:
+            self.groups.extend(array("I", [code + offset for code in other.groups]))
+        else:
+            self.groups.extend(other.groups)
+        self.attribute_codes.extend(other.attribute_codes)
+        self.op_codes.extend(other.op_codes)
+        self.value.extend(other.value)
+
+    def slice(self, start: int, end: int) -> AttributeBuffers:
+        return AttributeBuffers.from_codes(
+            self.names,
+            self.groups[start:end],
+            self.attribute_codes[start:end],
+            self.op_codes[start:end],
+            self.value[start:end],
+        )
+
+    def sorted_by_group(self) -> AttributeBuffers:
+        # Stable, so every group keeps its rows in their original order
+        names, groups = self.names, self.groups
+        order = sorted(range(len(self)), key=lambda idx: names[groups[idx]])
+        return AttributeBuffers.from_codes(
+            names,
+            array("I", map(groups.__getitem__, order)),
+            array("H", map(self.attribute_codes.__getitem__, order)),
+            array("H", map(self.op_codes.__getitem__, order)),
+            list(map(self.value.__getitem__, order)),
+        )
+
+    def with_values(self, attribute: str, values: List[str]) -> AttributeBuffers:
+        # Copy with the value of each row of `attribute` replaced, in order; other columns are shared
+        code = symbol_code(attribute)
+        positions = [idx for idx, attribute_code in enumerate(self.attribute_codes) if attribute_code == code]
+        if len(positions) != len(values):
+            raise ValueError(f"expected one {attribute} row per value")
+        new_values = list(self.value)
+        for idx, value in zip(positions, values):
+            new_values[idx] = value
+        return AttributeBuffers.from_codes(self.names, self.groups, self.attribute_codes, self.op_codes, new_values)
+
+    def iter_records(self) -> Iterator[Tuple[str, str, str, str]]:
+        return zip(
+            map(self.names.__getitem__, self.groups),
+            map(_symbols.__getitem__, self.attribute_codes),
+            map(_symbols.__getitem__, self.op_codes),
+            self.value,
+        )
+
+    def records(self) -> List[Tuple[str, str, str, str]]:
+        return list(self.iter_records())
+
+
+AttributeFrame = Union["pd.DataFrame", AttributeBuffers]
+
+
+def has_group(frame: AttributeFrame, groupname: str) -> bool:
+    if isinstance(frame, AttributeBuffers):
+        return frame.has_group(groupname)
+    return bool((frame["groupname"] == groupname).any())
+
+
+def build_attribute_buffers(
+    rows: List[PlanRow],
+    perc: int,
+    main_config: Dict[str, Any],
+    one_offs: bool = True,
+    cache: Optional[SpeedTierCache] = None,
+) -> Tuple[AttributeBuffers, AttributeBuffers]:
+    width = len(PLAN_REPLY_ATTRIBUTES)
+    with metrics.phase("build_rows"):
+        plan_names = [str(row.PLAN) for row in rows]
+        session_timeout = str(main_config["session_timeout"])
+        framed_pool = str(main_config["framed_pool"])
+        values: List[str] = []
+        for row, name in zip(rows, plan_names):
+            if cache is not None:
+                speed = cache.get(row, perc, main_config)
+            else:
+                speed = calc_speed_tier_values(row, perc, main_config)
+            # Same order as PLAN_REPLY_ATTRIBUTES
+            values.extend(
+                (
+                    session_timeout,
+                    framed_pool,
+                    speed.mt_rate_limit,
+                    name,
+                    name,
+                    speed.ne_ul,
+                    speed.ne_dl,
+                    speed.cambium_ul,
+                    speed.cambium_dl,
+                    session_timeout,
+                    "cst-acl-profile",
+                    "0",
+                )
+            )
+        n = len(plan_names)
+        op_code = array("H", [symbol_code(":=")])
+        radgroupcheck = AttributeBuffers.from_codes(
+            plan_names,
+            array("I", range(n)),
+            array("H", [symbol_code("Auth-Type")]) * n,
+            op_code * n,
+            ["Local"] * n,
+        )
+        radgroupreply = AttributeBuffers.from_codes(
+            list(plan_names),
+            array("I", (idx for idx in range(n) for _ in range(width))),
+            array("H", map(symbol_code, PLAN_REPLY_ATTRIBUTES)) * n,
+            op_code * (n * width),
+            values,
+        )
+    metrics.add_rows("build_rows", len(radgroupcheck) + len(radgroupreply))
+
+    if one_offs:
+        one_off_check, one_off_reply = one_off_frames(has_group(radgroupcheck, "unauth"), "buffers")
+        radgroupcheck.extend(one_off_check)
+        radgroupreply.extend(one_off_reply)
+    return radgroupcheck, radgroupreply
+
+
+def build_attribute_rows(
+    rows: List[PlanRow],
+    perc: int,
+    main_config: Dict[str, Any],
+    one_offs: bool = True,
+    progress: bool = True,
+    cache: Optional[SpeedTierCache] = None,
+) -> Tuple[AttributeBuffers, AttributeBuffers]:
+    logger = logging.getLogger("burster")
+    total = len(rows)
+    # Each plan's row dicts are folded into the column store right away instead of accumulating
+    radgroupcheck, radgroupreply = AttributeBuffers(), AttributeBuffers()
+
+    from tqdm import tqdm
+
+    log_interval = max(1, total // 10)  # 10% intervals
+    with tqdm(total=total, desc="Processing plans", unit="plan", disable=not progress) as pbar:
+        for idx, row in enumerate(rows, 1):
+            plan_check_rows, plan_reply_rows = build_plan_attribute_rows(
+                row, perc, main_config, cache
+            )
+            radgroupcheck.extend_rows(plan_check_rows)
+            radgroupreply.extend_rows(plan_reply_rows)
+            pbar.update(1)
+            if progress and (idx % log_interval == 0 or idx == total):
+                logger.info("Progress: %d/%d (%.0f%%)", idx, total, (idx / total) * 100)
+
+    if one_offs:
+        logger.info("Appending one-off groups")
+        one_off_check, one_off_reply = one_off_frames(radgroupcheck.has_group("unauth"), "buffers")
+        radgroupcheck.extend(one_off_check)
+        radgroupreply.extend(one_off_reply)
+    metrics.add_rows("build_rows", len(radgroupcheck) + len(radgroupreply))
+    return radgroupcheck, radgroupreply
+
+
+def _int_strings(values: np.ndarray) -> np.ndarray:
+    import numpy as np
+
+    # astype(int64) truncates toward zero exactly like int() on a float
+    return values.astype(np.int64).astype(str).astype(object)
+
+
+def calc_mt_rate_limit_columns(
+    ul_base: np.ndarray, dl_base: np.ndarray, perc: int, main_config: Dict[str, Any]
+) -> np.ndarray:
+    # Array form of calc_mt_rate_limit; ul_base/dl_base already include the boost
+    import numpy as np
+
+    sbp = float(main_config["sbp"])
+    burst_period = float(main_config["burst_period"])
+
+    ul_max = (ul_base * (float(perc) / 100)).astype(np.int64)
+    dl_max = (dl_base * (float(perc) / 100)).astype(np.int64)
+    if int(perc) >= 100:
+        return _int_strings(ul_max) + "k/" + _int_strings(dl_max) + "k"
+
+    ul_burst = ul_base.astype(np.int64)
+    dl_burst = dl_base.astype(np.int64)
+    ratio = float(sbp / burst_period)
+    ul_thresh = ((ul_burst.astype(float) - ul_max.astype(float)) * ratio) + ul_max.astype(float)
+    dl_thresh = ((dl_burst.astype(float) - dl_max.astype(float)) * ratio) + dl_max.astype(float)
+    bp = str(int(burst_period))
+    return (
+        _int_strings(ul_max) + "k/" + _int_strings(dl_max) + "k "
+        + _int_strings(ul_burst) + "k/" + _int_strings(dl_burst) + "k "
+        + _int_strings(ul_thresh) + "k/" + _int_strings(dl_thresh) + "k "
+        + bp + "/" + bp
+    )
+
+
+def one_off_frames(
+    has_unauth_plan: bool, engine: str = "columnar", groups: Optional[Set[str]] = None
+) -> Tuple[AttributeFrame, AttributeFrame]:
+    # `groups` limits the rows to those one-off groups
+    radgroupcheck_rows: List[Dict[str, str]] = []
+    radgroupreply_rows: List[Dict[str, str]] = []
+    with metrics.phase("append_one_off_groups"):
+        append_one_off_groups(radgroupcheck_rows, radgroupreply_rows)
+    # append_one_off_groups only adds the unauth check row when no plan already uses it
+    if has_unauth_plan:
+        radgroupcheck_rows = [r for r in radgroupcheck_rows if r["groupname"] != "unauth"]
+    if groups is not None:
+        radgroupcheck_rows = [r for r in radgroupcheck_rows if r["groupname"] in groups]
+        radgroupreply_rows = [r for r in radgroupreply_rows if r["groupname"] in groups]
+    metrics.add_rows("append_one_off_groups", len(radgroupcheck_rows) + len(radgroupreply_rows))
+    if engine == "buffers":
+        return (
+            AttributeBuffers.from_rows(radgroupcheck_rows),
+            AttributeBuffers.from_rows(radgroupreply_rows),
+        )
+    import pandas as pd
+
+    return (
+        pd.DataFrame(radgroupcheck_rows, columns=ATTRIBUTE_COLUMNS),
+        pd.DataFrame(radgroupreply_rows, columns=ATTRIBUTE_COLUMNS),
+    )
+
+
+def calc_plan_reply_values(
+    rows: List[PlanRow],
+    perc: int,
+    main_config: Dict[str, Any],
+    cache: Optional[SpeedTierCache] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Returns the plan groupnames and an (n, len(PLAN_REPLY_ATTRIBUTES)) matrix of reply values
+    import numpy as np
+    import pandas as pd
+
+    plans = pd.DataFrame(rows, columns=PLAN_COLUMNS)
+    n = len(plans)
+    ul = plans["UL"].to_numpy(dtype=np.float64)
+    dl = plans["DL"].to_numpy(dtype=np.float64)
+    if np.isnan(ul).any() or np.isnan(dl).any():
+        raise ValueError("plans table has rows without UL/DL")
+
+    boost = 1 + (float(main_config["boost_perc"]) / 100)
+    ul_base = ul * 1000 * boost
+    dl_base = dl * 1000 * boost
+    groupnames = plans["PLAN"].to_numpy(dtype=object)
+    session_timeout = str(main_config["session_timeout"])
+
+    values = np.empty((n, len(PLAN_REPLY_ATTRIBUTES)), dtype=object)
+    values[:, 0] = session_timeout
+    values[:, 1] = str(main_config["framed_pool"])
+    values[:, 3] = groupnames
+    values[:, 4] = groupnames
+    if cache is not None and n:
+        # Format each distinct (UL, DL) tier once and fan the shared strings out to its plans
+        tiers, inverse = np.unique(np.column_stack([ul, dl]), axis=0, return_inverse=True)
+        tier_values = np.array(
+            [cache.get(PlanRow(None, tier_ul, tier_dl), perc, main_config) for tier_ul, tier_dl in tiers],
+            dtype=object,
+        )[inverse.reshape(-1)]
+        values[:, 2] = tier_values[:, 0]
+        values[:, 5:9] = tier_values[:, 1:5]
+    else:
+        values[:, 2] = calc_mt_rate_limit_columns(ul_base, dl_base, perc, main_config)
+        values[:, 5] = _int_strings(ul * 1_000_000 * boost)
+        values[:, 6] = _int_strings(dl * 1_000_000 * boost)
+        values[:, 7] = _int_strings(ul_base)
+        values[:, 8] = _int_strings(dl_base)
+    values[:, 9] = session_timeout
+    values[:, 10] = "cst-acl-profile"
+    values[:, 11] = "0"
+    return groupnames, values
+
+
+def build_attribute_frames_columnar(
+    rows: List[PlanRow],
+    perc: int,
+    main_config: Dict[str, Any],
+    one_offs: bool = True,
+    cache: Optional[SpeedTierCache] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    with metrics.phase("build_rows"):
+        groupnames, values = calc_plan_reply_values(rows, perc, main_config, cache)
+    metrics.add_rows("build_rows", len(groupnames) + values.size)
+    with metrics.phase("build_dataframes"):
+        plan_check_df, plan_reply_df = plan_frames(groupnames, values)
+
+    if not one_offs:
+        return plan_check_df, plan_reply_df
+
+    one_off_check_df, one_off_reply_df = one_off_frames(has_group(plan_check_df, "unauth"))
+    import pandas as pd
+
+    with metrics.phase("build_dataframes"):
+        radgroupcheck_df = pd.concat([plan_check_df, one_off_check_df], ignore_index=True)
+        radgroupreply_df = pd.concat([plan_reply_df, one_off_reply_df], ignore_index=True)
+    return radgroupcheck_df, radgroupreply_df
+
+
+def plan_frames(groupnames: np.ndarray, values: np.ndarray) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    import numpy as np
+    import pandas as pd
+
+    n = len(groupnames)
+    plan_check_df = pd.DataFrame(
+        {"groupname": groupnames, "attribute": "Auth-Type", "op": ":=", "value": "Local"},
+        columns=ATTRIBUTE_COLUMNS,
+    )
+    plan_reply_df = pd.DataFrame(
+        {
+            "groupname": np.repeat(groupnames, len(PLAN_REPLY_ATTRIBUTES)),
+            "attribute": np.tile(np.array(PLAN_REPLY_ATTRIBUTES, dtype=object), n),
+            "op": ":=",
+            "value": values.ravel(),
+        },
+        columns=ATTRIBUTE_COLUMNS,
+    )
+    return plan_check_df, plan_reply_df
+
+
+def build_attribute_frames(
+    rows: List[PlanRow],
+    perc: int,
+    main_config: Dict[str, Any],
+    engine: str = "buffers",
+    one_offs: bool = True,
+    progress: bool = True,
+    cache: Optional[SpeedTierCache] = None,
+) -> Tuple[AttributeFrame, AttributeFrame]:
+    if engine == "buffers":
+        return build_attribute_buffers(rows, perc, main_config, one_offs, cache)
+    if engine == "columnar":
+        return build_attribute_frames_columnar(rows, perc, main_config, one_offs, cache)
+    if engine == "rows":
+        with metrics.phase("build_rows"):
+            radgroupcheck, radgroupreply = build_attribute_rows(
+                rows, perc, main_config, one_offs, progress, cache
+            )
+        import pandas as pd
+
+        with metrics.phase("build_dataframes"):
+            return (
+                pd.DataFrame(radgroupcheck.columns(), columns=ATTRIBUTE_COLUMNS),
+                pd.DataFrame(radgroupreply.columns(), columns=ATTRIBUTE_COLUMNS),
+            )
+    raise ValueError(f"Unknown engine: {engine}")
+
+
+def concat_frames(frames: List[AttributeFrame]) -> AttributeFrame:
+    if not frames or isinstance(frames[0], AttributeBuffers):
+        combined = AttributeBuffers()
+        for frame in frames:
+            combined.extend(frame)
+        return combined
+    import pandas as pd
+
+    return pd.concat(frames, ignore_index=True)
+
+
+# Speed tier cache of a --workers pool process, kept across the chunks it builds
+_worker_cache: Optional[SpeedTierCache] = None
+
+
+def _init_build_worker(cache_size: int) -> None:
+    global _worker_cache
+    _worker_cache = SpeedTierCache(cache_size) if cache_size > 0 else None
+
+
+def _build_chunk(
+    chunk: List[PlanRow], perc: int, main_config: Dict[str, Any], engine: str
+) -> Tuple[AttributeFrame, AttributeFrame, int, int]:
+    # Runs in a pool process; the frames travel back pickled as plain column lists
+    hits, misses = (_worker_cache.hits, _worker_cache.misses) if _worker_cache is not None else (0, 0)
+    radgroupcheck_df, radgroupreply_df = build_attribute_frames(
+        chunk, perc, main_config, engine, one_offs=False, progress=False, cache=_worker_cache
+    )
+    if _worker_cache is None:
+        return radgroupcheck_df, radgroupreply_df, 0, 0
+    return radgroupcheck_df, radgroupreply_df, _worker_cache.hits - hits, _worker_cache.misses - misses
+
+
+def build_plan_chunks(
+    chunks: Iterator[List[PlanRow]],
+    perc: int,
+    main_config: Dict[str, Any],
+    engine: str,
+    workers: int = 1,
+    cache: Optional[SpeedTierCache] = None,
+) -> Iterator[Tuple[List[PlanRow], AttributeFrame, AttributeFrame]]:
+    # Plan-only frames per chunk, in input order. With workers > 1 the chunks are built on a process
+    # pool, at most two per worker in flight, so the output is identical to building them here.
+    if workers <= 1:
+        for chunk in chunks:
+            radgroupcheck_df, radgroupreply_df = build_attribute_frames(
+                chunk, perc, main_config, engine, one_offs=False, progress=False, cache=cache
+            )
+            yield chunk, radgroupcheck_df, radgroupreply_df
+        return
+
+    cache_size = cache.maxsize if cache is not None else 0
+    # Never fork: --pipeline's threads may hold metrics or logging locks at that moment, and a forked
+    # worker would inherit them locked
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=_init_build_worker,
+        initargs=(cache_size,),
+    )
+    pending: "deque[Tuple[List[PlanRow], Future]]" = deque()
+    try:
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(_build_chunk, chunk, perc, main_config, engine)))
+            while len(pending) >= 2 * workers or (pending and pending[0][1].done()):
+                yield _collect_chunk(pending.popleft(), cache)
+        while pending:
+            yield _collect_chunk(pending.popleft(), cache)
+    finally:
+        # Also reached when the consumer stops early; chunks not yet started are dropped
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _collect_chunk(
+    entry: Tuple[List[PlanRow], Future], cache: Optional[SpeedTierCache]
+) -> Tuple[List[PlanRow], AttributeFrame, AttributeFrame]:
+    chunk, future = entry
+    with metrics.phase("build_rows"):
+        radgroupcheck_df, radgroupreply_df, hits, misses = future.result()
+    metrics.add_rows("build_rows", len(radgroupcheck_df) + len(radgroupreply_df))
+    if cache is not None:
+        cache.add_stats(hits, misses)
+    return chunk, radgroupcheck_df, radgroupreply_df
+
+
+def build_attribute_frames_sharded(
+    rows: List[PlanRow],
+    perc: int,
+    main_config: Dict[str, Any],
+    engine: str,
+    workers: int,
+    chunk_size: int,
+    cache: Optional[SpeedTierCache] = None,
+) -> Tuple[AttributeFrame, AttributeFrame]:
+    # Same frames as build_attribute_frames, built chunk by chunk on `workers` processes
+    chunks = (rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size))
+    check_frames: List[AttributeFrame] = []
+    reply_frames: List[AttributeFrame] = []
+    has_unauth_plan = False
+    for _, radgroupcheck_df, radgroupreply_df in build_plan_chunks(
+        chunks, perc, main_config, engine, workers, cache
+    ):
+        has_unauth_plan = has_unauth_plan or has_group(radgroupcheck_df, "unauth")
+        check_frames.append(radgroupcheck_df)
+        reply_frames.append(radgroupreply_df)
+    one_off_check, one_off_reply = one_off_frames(has_unauth_plan, engine)
+    with metrics.phase("build_dataframes"):
+        return concat_frames(check_frames + [one_off_check]), concat_frames(reply_frames + [one_off_reply])
+
+
+def tier_reply_frame(
+    radgroupreply_df: AttributeFrame,
+    rows: List[PlanRow],
+    perc: int,
+    main_config: Dict[str, Any],
+    cache: Optional[SpeedTierCache] = None,
+) -> AttributeFrame:
+    # Only Mikrotik-Rate-Limit depends on the percent; everything else is shared across tiers
+    if cache is not None:
+        rates = [cache.get(row, perc, main_config).mt_rate_limit for row in rows]
+    else:
+        rates = [calc_mt_rate_limit(row, perc, main_config) for row in rows]
+    if isinstance(radgroupreply_df, AttributeBuffers):
+        return radgroupreply_df.with_values("Mikrotik-Rate-Limit", rates)
+    mask = (radgroupreply_df["attribute"] == "Mikrotik-Rate-Limit").to_numpy()
+    if int(mask.sum()) != len(rates):
+        raise ValueError("radgroupreply frame does not have one Mikrotik-Rate-Limit row per plan")
+    tier_df = radgroupreply_df.copy()
+    tier_df.loc[mask, "value"] = rates
+    return tier_df
+
+
+def staged_frames(
+    radgroupcheck_df: AttributeFrame,
+    radgroupreply_df: AttributeFrame,
+    rows: List[PlanRow],
+    tiers: List[int],
+    main_config: Dict[str, Any],
+    cache: Optional[SpeedTierCache] = None,
+) -> List[Tuple[str, AttributeFrame]]:
+    # radgroupreply_df was built for tiers[0]; derive the other tiers from it
+    frames: List[Tuple[str, AttributeFrame]] = []
+    for idx, (check_table, reply_table) in enumerate(staging_tables(tiers)):
+        reply_df = radgroupreply_df
+        if idx > 0:
+            reply_df = tier_reply_frame(radgroupreply_df, rows, tiers[idx], main_config, cache)
+        frames.append((check_table, radgroupcheck_df))
+        frames.append((reply_table, reply_df))
+    return frames
+
+
+def iter_frame_records(dataframe: AttributeFrame) -> Iterator[Tuple[str, str, str, str]]:
+    # Decoded one row at a time, so loading never holds a second copy of the table as tuples
+    if isinstance(dataframe, AttributeBuffers):
+        return dataframe.iter_records()
+    return (
+        tuple(str(value) for value in record)
+        for record in dataframe[ATTRIBUTE_COLUMNS].itertuples(index=False, name=None)
+    )
+
+
+def dataframe_records(dataframe: AttributeFrame) -> List[Tuple[str, str, str, str]]:
+    return list(iter_frame_records(dataframe))
+
+
+def add_frame_fingerprints(
+    fingerprints: Dict[str, Tuple[int, int]], frames: List[Tuple[str, AttributeFrame]]
+) -> None:
+    # Accumulates what each staging table must hold once `frames` are loaded
+    with metrics.phase("fingerprint_rows"):
+        seen: Dict[int, Tuple[int, int]] = {}
+        for table_name, frame in frames:
+            if id(frame) not in seen:
+                # Every tier shares the same radgroupcheck frame
+                seen[id(frame)] = records_fingerprint(iter_frame_records(frame))
+            count, checksum = fingerprints.get(table_name, (0, 0))
+            fingerprints[table_name] = (count + seen[id(frame)][0], checksum + seen[id(frame)][1])
+
+
+def verify_staged_tables(config: configparser.RawConfigParser, expected: Dict[str, Tuple[int, int]]) -> None:
+    logger = logging.getLogger("burster")
+    try:
+        with metrics.phase("verify_staging"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            actual = table_fingerprints(cur, list(expected), ATTRIBUTE_COLUMNS)
+            con.commit()
+    except mdb.Error as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+    metrics.add_rows("verify_staging", sum(count for count, _ in expected.values()))
+
+    mismatched = [table_name for table_name in expected if actual.get(table_name) != expected[table_name]]
+    for table_name in mismatched:
+        count, checksum = actual.get(table_name, (0, 0))
+        logger.error(
+            "%s holds %d rows (checksum %d), expected %d rows (checksum %d)",
+            table_name,
+            count,
+            checksum,
+            *expected[table_name],
+        )
+    if mismatched:
+        # Nothing is swapped, so the live tables keep serving the previous rows
+        print("Error: staging tables do not match the generated rows: {}".format(", ".join(mismatched)))
+        sys.exit(1)
+    logger.info("Verified %d staging tables against the generated rows", len(expected))
+
+
+def _escape_load_data_field(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+        .replace("\0", "\\0")
+    )
+
+
+def load_data_infile(
+    cur: Any, table_name: str, rows: Iterable[Tuple[str, str, str, str]], tmpdir: str
+) -> None:
+    # PyMySQL streams LOCAL INFILE from a named file, so stage the TSV on tmpfs when available;
+    # the file is removed on close, whether writing or loading it failed
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", newline="", prefix=f"{table_name}.", suffix=".tsv", dir=tmpdir
+    ) as tsv:
+        for record in rows:
+            tsv.write("\t".join(_escape_load_data_field(value) for value in record))
+            tsv.write("\n")
+        tsv.flush()
+        cur.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table_name} CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            "(groupname, attribute, op, value);",
+            (tsv.name,),
+        )
+
+
+def executemany_insert(
+    cur: Any, table_name: str, rows: Iterable[Tuple[str, ...]], columns: List[str] = ATTRIBUTE_COLUMNS
+) -> None:
+    # PyMySQL folds executemany into multi-row INSERTs; size them to the server's packet limit
+    cur.execute("SELECT @@max_allowed_packet;")
+    max_allowed_packet = int(cur.fetchone()[0])
+    cur.max_stmt_length = max(MIN_STMT_LENGTH, max_allowed_packet - PACKET_HEADROOM)
+    cur.executemany(
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))});",
+        rows,
+    )
+
+
+def insert_dataframe(
+    config: configparser.RawConfigParser, table_name: str, dataframe: AttributeFrame
 ) -> None:
     if dataframe.empty:
         return
 
-    raddb_creds = get_raddb_creds(config)
-    con = None
+    global _load_data_unavailable
+    logger = logging.getLogger("burster")
+    use_load_data = get_loader(config) == "load_data" and not _load_data_unavailable
+    with metrics.phase(f"bulk_insert:{table_name}"), get_pool(config, "raddb").connection() as con:
+        cur = con.cursor()
+        if use_load_data:
+            try:
+                load_data_infile(cur, table_name, iter_frame_records(dataframe), get_load_tmpdir(config))
+            except mdb.Error as e:
+                if not e.args or e.args[0] not in LOAD_DATA_DISABLED_ERRORS:
+                    raise
+                logger.warning(
+                    "LOAD DATA LOCAL INFILE unavailable (%s); falling back to executemany", e
+                )
+                _load_data_unavailable = True
+                use_load_data = False
+        if not use_load_data:
+            executemany_insert(cur, table_name, iter_frame_records(dataframe))
+        con.commit()
+    metrics.add_rows(f"bulk_insert:{table_name}", len(dataframe))
+
+
+def bulk_insert_dataframe(
+    config: configparser.RawConfigParser, table_name: str, dataframe: AttributeFrame
+) -> None:
     try:
-        con = mdb.connect(
-            host=raddb_creds["host"],
-            db=raddb_creds["db"],
-            user=raddb_creds["user"],
-            password=raddb_creds["pass"],
+        insert_dataframe(config, table_name, dataframe)
+    except mdb.Error as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+
+def split_frame_by_group(dataframe: AttributeFrame, parts: int) -> List[AttributeFrame]:
+    # Cut only where groupname changes so each group's rows stay in one INSERT, in order
+    if parts <= 1 or len(dataframe) < 2:
+        return [dataframe]
+    if isinstance(dataframe, AttributeBuffers):
+        groupnames = dataframe.groupname
+    else:
+        groupnames = dataframe["groupname"].tolist()
+    boundaries = [idx for idx in range(1, len(groupnames)) if groupnames[idx] != groupnames[idx - 1]]
+    cuts = sorted(
+        {
+            boundaries[idx]
+            for idx in (
+                bisect.bisect_left(boundaries, len(groupnames) * i // parts) for i in range(1, parts)
+            )
+            if idx < len(boundaries)
+        }
+    )
+    spans = [(start, end) for start, end in zip([0] + cuts, cuts + [len(groupnames)]) if end > start]
+    if isinstance(dataframe, AttributeBuffers):
+        return [dataframe.slice(start, end) for start, end in spans]
+    return [dataframe.iloc[start:end] for start, end in spans]
+
+
+def load_frames(
+    config: configparser.RawConfigParser,
+    frames: List[Tuple[str, AttributeFrame]],
+    workers: int = 1,
+    reply_chunks: int = 1,
+) -> None:
+    if workers <= 1:
+        for table_name, dataframe in frames:
+            bulk_insert_dataframe(config, table_name, dataframe)
+        return
+
+    logger = logging.getLogger("burster")
+    tasks: List[Tuple[str, AttributeFrame]] = []
+    for table_name, dataframe in frames:
+        parts = reply_chunks if table_name.startswith("radgroupreply") else 1
+        tasks.extend((table_name, part) for part in split_frame_by_group(dataframe, parts))
+
+    def _load(table_name: str, dataframe: AttributeFrame) -> Tuple[float, float]:
+        started = time.perf_counter()
+        insert_dataframe(config, table_name, dataframe)
+        return started, time.perf_counter()
+
+    spans: Dict[str, List[Tuple[float, float, int]]] = defaultdict(list)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="burster-load") as executor:
+        futures = {
+            executor.submit(_load, table_name, dataframe): (table_name, len(dataframe))
+            for table_name, dataframe in tasks
+        }
+        try:
+            for future in as_completed(futures):
+                table_name, row_count = futures[future]
+                started, finished = future.result()
+                spans[table_name].append((started, finished, row_count))
+        except (mdb.Error, RuntimeError) as e:
+            # Abort before the swap; chunks already running finish into the staging tables only
+            for pending in futures:
+                pending.cancel()
+            print("Error: {}".format(e))
+            sys.exit(1)
+
+    for table_name, table_spans in spans.items():
+        rows = sum(count for _, _, count in table_spans)
+        elapsed = max(end for _, end, _ in table_spans) - min(start for start, _, _ in table_spans)
+        logger.info(
+            "Loaded %d rows into %s in %.2fs (%.0f rows/s, %d chunk(s))",
+            rows,
+            table_name,
+            elapsed,
+            rows / elapsed if elapsed > 0 else 0.0,
+            len(table_spans),
         )
-        cur = con.cursor()
-        columns = ["groupname", "attribute", "op", "value"]
-        rows = [
-            tuple(str(value) for value in record)
-            for record in dataframe[columns].itertuples(index=False, name=None)
-        ]
+
+
+def stream_into_temp_tables(
+    config: configparser.RawConfigParser,
+    tiers: List[int],
+    main_config: Dict[str, Any],
+    engine: str,
+    chunk_size: int,
+    workers: int = 1,
+    reply_chunks: int = 1,
+    cache: Optional[SpeedTierCache] = None,
+    fingerprints: Optional[Dict[str, Tuple[int, int]]] = None,
+    build_workers: int = 1,
+) -> Tuple[int, int, int]:
+    logger = logging.getLogger("burster")
+    plans = check_count = reply_count = 0
+    has_unauth_plan = False
+    from tqdm import tqdm
+
+    with tqdm(desc="Streaming plans", unit="plan") as pbar:
+        for chunk, radgroupcheck_df, radgroupreply_df in build_plan_chunks(
+            iter_plan_chunks(config, chunk_size), tiers[0], main_config, engine, build_workers, cache
+        ):
+            has_unauth_plan = has_unauth_plan or has_group(radgroupcheck_df, "unauth")
+            frames = staged_frames(radgroupcheck_df, radgroupreply_df, chunk, tiers, main_config, cache)
+            if fingerprints is not None:
+                add_frame_fingerprints(fingerprints, frames)
+            load_frames(config, frames, workers, reply_chunks)
+            plans += len(chunk)
+            check_count += len(radgroupcheck_df)
+            reply_count += len(radgroupreply_df)
+            pbar.update(len(chunk))
+            logger.debug("Flushed chunk of %d plans (%d total)", len(chunk), plans)
+
+    logger.info("Appending one-off groups")
+    radgroupcheck_df, radgroupreply_df = one_off_frames(has_unauth_plan, engine)
+    frames = staged_frames(radgroupcheck_df, radgroupreply_df, [], tiers, main_config, cache)
+    if fingerprints is not None:
+        add_frame_fingerprints(fingerprints, frames)
+    load_frames(config, frames)
+    return (
+        plans,
+        check_count + len(radgroupcheck_df),
+        reply_count + len(radgroupreply_df),
+    )
+
+
+def update_plans(
+    config: configparser.RawConfigParser,
+    rows: List[PlanRow],
+    perc: Optional[int],
+    main_config: Dict[str, Any],
+    engine: str = "buffers",
+    cache: Optional[SpeedTierCache] = None,
+) -> None:
+    # Replace just these plans' groups in the live tables and in every staged tier, set-based,
+    # in one transaction on one connection
+    logger = logging.getLogger("burster")
+    try:
+        with metrics.phase("update_plans"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            tables = _list_radgroup_tables(cur)
+            live_perc = _table_tier(tables.get("radgroupreply", ""))
+            if perc is None:
+                # Without -p or BURSTER_PERCENT the plans follow the rest of the live tables
+                perc = live_perc if live_perc is not None else DEFAULT_PERCENT
+            elif live_perc is not None and live_perc != perc:
+                logger.warning(
+                    "Live tables hold tier %d; regenerating the plans at the requested %d", live_perc, perc
+                )
+            targets = [("radgroupcheck", "radgroupreply", perc)]
+            for table_name, comment in sorted(tables.items()):
+                tier = _table_tier(comment)
+                if tier is not None and TIER_TABLE_RE.match(table_name) and "reply" in table_name:
+                    targets.append((tier_table("radgroupcheck", tier), table_name, tier))
+
+            radgroupcheck_df, radgroupreply_df = build_attribute_frames(
+                rows, targets[0][2], main_config, engine, one_offs=False, progress=False, cache=cache
+            )
+            # A plan named like a one-off group (unauth, tech, ...) shares that group, and a full build
+            # deploys the one-off rows right after the plan's; the DELETE below removes both
+            names = {str(row.PLAN) for row in rows}
+            one_off_check, one_off_reply = one_off_frames("unauth" in names, engine, groups=names)
+            if len(one_off_check) or len(one_off_reply):
+                radgroupcheck_df = concat_frames([radgroupcheck_df, one_off_check])
+                radgroupreply_df = concat_frames([radgroupreply_df, one_off_reply])
+            for temp_table, template in (
+                ("burster_plan_check", "radgroupcheck_template"),
+                ("burster_plan_reply", "radgroupreply_template"),
+            ):
+                cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {temp_table};")
+                cur.execute(f"CREATE TEMPORARY TABLE {temp_table} LIKE {template};")
+
+            con.begin()
+            executemany_insert(cur, "burster_plan_check", dataframe_records(radgroupcheck_df))
+            for check_table, reply_table, tier in targets:
+                reply_df = radgroupreply_df
+                if tier != targets[0][2]:
+                    reply_df = tier_reply_frame(radgroupreply_df, rows, tier, main_config, cache)
+                cur.execute("DELETE FROM burster_plan_reply;")
+                executemany_insert(cur, "burster_plan_reply", dataframe_records(reply_df))
+                for table_name, temp_table in (
+                    (check_table, "burster_plan_check"),
+                    (reply_table, "burster_plan_reply"),
+                ):
+                    cur.execute(
+                        f"DELETE FROM {table_name} WHERE groupname IN (SELECT groupname FROM {temp_table});"
+                    )
+                    cur.execute(
+                        f"INSERT INTO {table_name} (groupname, attribute, op, value) "
+                        f"SELECT groupname, attribute, op, value FROM {temp_table} ORDER BY id;"
+                    )
+                logger.info("Replaced %d plans in %s/%s (tier %d)", len(rows), check_table, reply_table, tier)
+            con.commit()
+            metrics.add_rows("update_plans", len(radgroupcheck_df) + len(radgroupreply_df))
+            cur.execute("DROP TEMPORARY TABLE IF EXISTS burster_plan_check, burster_plan_reply;")
+    except mdb.Error as e:
+        # The pool closes the failed connection, which rolls the transaction back
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+
+def retune_plans(
+    config: configparser.RawConfigParser,
+    rows: List[PlanRow],
+    perc: int,
+    main_config: Dict[str, Any],
+    cache: Optional[SpeedTierCache] = None,
+) -> None:
+    # Only Mikrotik-Rate-Limit depends on the percent: load each plan's new rate into a keyed
+    # temporary table and rewrite the live radgroupreply rows with one UPDATE ... JOIN
+    logger = logging.getLogger("burster")
+    try:
+        with metrics.phase("retune"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            tables = _list_radgroup_tables(cur)
+            live_perc = _table_tier(tables.get("radgroupreply", ""))
+            if cache is not None:
+                rates = {str(row.PLAN): cache.get(row, perc, main_config).mt_rate_limit for row in rows}
+            else:
+                rates = {str(row.PLAN): calc_mt_rate_limit(row, perc, main_config) for row in rows}
+
+            cur.execute("DROP TEMPORARY TABLE IF EXISTS burster_retune;")
+            # Column types, charset and collation follow the live schema, so the join compares like with like
+            cur.execute(
+                "CREATE TEMPORARY TABLE burster_retune (PRIMARY KEY (groupname)) "
+                "SELECT groupname, value FROM radgroupreply_template LIMIT 0;"
+            )
+            con.begin()
+            executemany_insert(cur, "burster_retune", rates.items(), ["groupname", "value"])
+            cur.execute(
+                "UPDATE radgroupreply r JOIN burster_retune t ON t.groupname = r.groupname "
+                "SET r.value = t.value "
+                "WHERE r.attribute = 'Mikrotik-Rate-Limit' AND r.value <> t.value;"
+            )
+            updated = cur.rowcount
+            con.commit()
+            if live_perc is not None and live_perc != perc:
+                # Retag only once the rates are committed; the check rows never depend on the percent
+                retag_live_tables(con, cur, perc)
+            cur.execute("DROP TEMPORARY TABLE IF EXISTS burster_retune;")
+            metrics.add_rows("retune", updated)
+            logger.info(
+                "Retuned %d Mikrotik-Rate-Limit rows for %d plans from tier %s to %d",
+                updated,
+                len(rates),
+                live_perc if live_perc is not None else "unknown",
+                perc,
+            )
+    except mdb.Error as e:
+        # The pool closes the failed connection, which rolls the transaction back
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+
+def pipeline_into_temp_tables(
+    config: configparser.RawConfigParser,
+    tiers: List[int],
+    main_config: Dict[str, Any],
+    engine: str,
+    chunk_size: int,
+    depth: int = 4,
+    workers: int = 1,
+    reply_chunks: int = 1,
+    cache: Optional[SpeedTierCache] = None,
+    defer_indexes: bool = False,
+    fingerprints: Optional[Dict[str, Tuple[int, int]]] = None,
+    build_workers: int = 1,
+) -> Tuple[int, int, int]:
+    # Same result as create_temp_tables + stream_into_temp_tables, but the staging tables are
+    # created while the first plans are read, and a loader thread drains built chunks from a
+    # bounded queue while later chunks are still being read and built
+    batches: "queue.Queue[Optional[List[Tuple[str, AttributeFrame]]]]" = queue.Queue(maxsize=max(1, depth))
+    abort = threading.Event()
+    errors: List[BaseException] = []
+
+    def _fail(error: BaseException) -> None:
+        errors.append(error)
+        abort.set()
+
+    def _create() -> None:
+        try:
+            create_temp_tables(config, tiers, defer_indexes)
+        except BaseException as e:
+            _fail(e)
+
+    def _get() -> Optional[List[Tuple[str, AttributeFrame]]]:
+        # Waits for the builder; None means done or aborted
+        with metrics.phase("pipeline_starved"):
+            while not abort.is_set():
+                try:
+                    return batches.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+        return None
+
+    def _put(batch: Optional[List[Tuple[str, AttributeFrame]]]) -> bool:
+        # Blocks while the loader is behind (backpressure), but never past an abort
+        with metrics.phase("pipeline_backpressure"):
+            while not abort.is_set():
+                try:
+                    batches.put(batch, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+        return False
+
+    def _load() -> None:
+        try:
+            creator.join()
+            while True:
+                batch = _get()
+                if batch is None:
+                    return
+                load_frames(config, batch, workers, reply_chunks)
+        except BaseException as e:
+            _fail(e)
+
+    creator = threading.Thread(target=_create, name="burster-create")
+    loader = threading.Thread(target=_load, name="burster-load")
+    creator.start()
+    loader.start()
+
+    logger = logging.getLogger("burster")
+    plans = check_count = reply_count = 0
+    has_unauth_plan = False
+    try:
+        chunks = iter_plan_chunks(config, chunk_size)
+        built = build_plan_chunks(chunks, tiers[0], main_config, engine, build_workers, cache)
+        for chunk, radgroupcheck_df, radgroupreply_df in built:
+            has_unauth_plan = has_unauth_plan or has_group(radgroupcheck_df, "unauth")
+            frames = staged_frames(radgroupcheck_df, radgroupreply_df, chunk, tiers, main_config, cache)
+            if fingerprints is not None:
+                add_frame_fingerprints(fingerprints, frames)
+            if not _put(frames):
+                # Closing the generators stops the build pool and discards the half-read connection
+                built.close()
+                chunks.close()
+                break
+            plans += len(chunk)
+            check_count += len(radgroupcheck_df)
+            reply_count += len(radgroupreply_df)
+            logger.debug("Queued chunk of %d plans (%d total)", len(chunk), plans)
+        else:
+            radgroupcheck_df, radgroupreply_df = one_off_frames(has_unauth_plan, engine)
+            frames = staged_frames(radgroupcheck_df, radgroupreply_df, [], tiers, main_config, cache)
+            if fingerprints is not None:
+                add_frame_fingerprints(fingerprints, frames)
+            if _put(frames):
+                check_count += len(radgroupcheck_df)
+                reply_count += len(radgroupreply_df)
+                _put(None)
+    except BaseException as e:
+        _fail(e)
+    finally:
+        loader.join()
+        creator.join()
+
+    if errors:
+        # Nothing was swapped; the half-filled staging tables are recreated by the next run
+        error = errors[0]
+        if isinstance(error, mdb.Error):
+            print("Error: {}".format(error))
+            sys.exit(1)
+        raise error
+    return plans, check_count, reply_count
+
+
+def read_live_rows(
+    cur: Any, table_name: str, for_update: bool = False
+) -> List[Tuple[int, str, str, str, str]]:
+    lock = " FOR UPDATE" if for_update else ""
+    cur.execute(f"SELECT id, groupname, attribute, op, value FROM {table_name} ORDER BY id{lock};")
+    return [
+        (int(row[0]), str(row[1]), str(row[2]), str(row[3]), str(row[4]))
+        for row in cur.fetchall()
+    ]
+
+
+def read_live_group_rows(
+    cur: Any, table_name: str, groups: List[str]
+) -> List[Tuple[int, str, str, str, str]]:
+    rows: List[Tuple[int, str, str, str, str]] = []
+    for start in range(0, len(groups), 1000):
+        batch = groups[start:start + 1000]
+        cur.execute(
+            f"SELECT id, groupname, attribute, op, value FROM {table_name} "
+            f"WHERE groupname IN ({', '.join(['%s'] * len(batch))}) ORDER BY id FOR UPDATE;",
+            batch,
+        )
+        rows.extend(
+            (int(row[0]), str(row[1]), str(row[2]), str(row[3]), str(row[4]))
+            for row in cur.fetchall()
+        )
+    return rows
+
+
+def diff_attribute_rows(
+    live_rows: List[Tuple[int, str, str, str, str]],
+    desired_rows: List[Tuple[str, str, str, str]],
+) -> Tuple[List[Tuple[str, str, str, str]], List[Tuple[str, int]], List[int]]:
+    # Rows are matched per (groupname, attribute, op) key. Identical values are kept,
+    # leftover live/desired pairs become UPDATEs, the rest INSERTs or DELETEs.
+    live_by_key: Dict[Tuple[str, str, str], List[Tuple[int, str]]] = defaultdict(list)
+    for row_id, groupname, attribute, op, value in live_rows:
+        live_by_key[(groupname, attribute, op)].append((row_id, value))
+    desired_by_key: Dict[Tuple[str, str, str], List[str]] = defaultdict(list)
+    for groupname, attribute, op, value in desired_rows:
+        desired_by_key[(groupname, attribute, op)].append(value)
+
+    inserts: List[Tuple[str, str, str, str]] = []
+    updates: List[Tuple[str, int]] = []
+    deletes: List[int] = []
+    for key in list(desired_by_key) + [k for k in live_by_key if k not in desired_by_key]:
+        live = live_by_key.get(key, [])
+        desired = desired_by_key.get(key, [])
+        unmatched = Counter(desired)
+        stale: List[int] = []
+        for row_id, value in live:
+            if unmatched[value] > 0:
+                unmatched[value] -= 1
+            else:
+                stale.append(row_id)
+        missing: List[str] = []
+        for value in desired:
+            if unmatched[value] > 0:
+                unmatched[value] -= 1
+                missing.append(value)
+
+        paired = min(len(stale), len(missing))
+        updates.extend(zip(missing[:paired], stale[:paired]))
+        inserts.extend(key + (value,) for value in missing[paired:])
+        deletes.extend(stale[paired:])
+    return inserts, updates, deletes
+
+
+def apply_attribute_diff(
+    cur: Any,
+    table_name: str,
+    inserts: List[Tuple[str, str, str, str]],
+    updates: List[Tuple[str, int]],
+    deletes: List[int],
+) -> None:
+    metrics.add_rows("incremental_sync", len(inserts) + len(updates) + len(deletes))
+    for start in range(0, len(deletes), 1000):
+        batch = deletes[start:start + 1000]
+        cur.execute(
+            f"DELETE FROM {table_name} WHERE id IN ({', '.join(['%s'] * len(batch))});",
+            batch,
+        )
+    if updates:
+        cur.executemany(f"UPDATE {table_name} SET value=%s WHERE id=%s;", updates)
+    if inserts:
         cur.executemany(
             f"INSERT INTO {table_name} (groupname, attribute, op, value) VALUES (%s, %s, %s, %s);",
-            rows,
+            inserts,
         )
-        con.commit()
+
+
+def sync_incremental(
+    config: configparser.RawConfigParser,
+    radgroupcheck_df: AttributeFrame,
+    radgroupreply_df: AttributeFrame,
+    perc: int,
+) -> None:
+    logger = logging.getLogger("burster")
+    try:
+        with metrics.phase("incremental_sync"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            drop_staged_tiers(cur)
+            live_perc = _table_tier(_list_radgroup_tables(cur).get("radgroupreply", ""))
+            con.begin()
+            for table_name, dataframe in (
+                ("radgroupcheck", radgroupcheck_df),
+                ("radgroupreply", radgroupreply_df),
+            ):
+                inserts, updates, deletes = diff_attribute_rows(
+                    read_live_rows(cur, table_name, for_update=True), dataframe_records(dataframe)
+                )
+                logger.info(
+                    "%s: %d inserts, %d updates, %d deletes",
+                    table_name,
+                    len(inserts),
+                    len(updates),
+                    len(deletes),
+                )
+                apply_attribute_diff(cur, table_name, inserts, updates, deletes)
+            con.commit()
+            if live_perc != perc:
+                retag_live_tables(con, cur, perc)
     except mdb.Error as e:
+        # The pool closes the failed connection, which rolls the transaction back
         print("Error: {}".format(e))
         sys.exit(1)
-    finally:
-        if con:
+
+
+# The row set of the last deploy, keyed by a hash of everything that went into building it
+class OutputArtifact(NamedTuple):
+    input_hash: str
+    fingerprints: Dict[str, Tuple[int, int]]
+    # SHA-256 over each table's rows as written, so a rebuild is compared without loading them back
+    digests: Dict[str, str]
+    counts: Dict[str, int]
+
+
+def output_input_hash(rows: List[PlanRow], main_config: Dict[str, Any], tiers: List[int]) -> str:
+    one_off_check: List[Dict[str, str]] = []
+    one_off_reply: List[Dict[str, str]] = []
+    append_one_off_groups(one_off_check, one_off_reply)
+    header = {
+        "version": OUTPUT_CACHE_VERSION,
+        "main_config": {key: str(value) for key, value in main_config.items()},
+        "tiers": tiers,
+        "one_offs": [one_off_check, one_off_reply],
+    }
+    digest = hashlib.sha256(json.dumps(header, sort_keys=True).encode())
+    for row in rows:
+        line = "\t".join(_escape_load_data_field(str(value)) for value in row)
+        digest.update(line.encode() + b"\n")
+    return digest.hexdigest()
+
+
+_LOAD_DATA_UNESCAPES = {"t": "\t", "n": "\n", "r": "\r", "0": "\0"}
+
+
+def _unescape_load_data_field(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: _LOAD_DATA_UNESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def _artifact_line(record: Tuple[str, str, str, str]) -> str:
+    return "\t".join(_escape_load_data_field(field) for field in record) + "\n"
+
+
+def frame_digest(frame: AttributeFrame) -> str:
+    digest = hashlib.sha256()
+    for record in iter_frame_records(frame):
+        digest.update(_artifact_line(record).encode())
+    return digest.hexdigest()
+
+
+def read_output_artifact(path: str) -> Optional[OutputArtifact]:
+    # gzip text: one JSON header line, then each table's rows as tab-separated escaped fields
+    logger = logging.getLogger("burster")
+    try:
+        with gzip.open(path, "rt", encoding="utf-8", newline="\n") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != OUTPUT_CACHE_VERSION:
+                return None
+            tables = [
+                (name, int(count), tuple(fingerprint), str(digest))
+                for name, count, fingerprint, digest in header["tables"]
+            ]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Ignoring unreadable output cache %s: %s", path, e)
+        return None
+    return OutputArtifact(
+        header["input_hash"],
+        {name: fingerprint for name, _, fingerprint, _ in tables},
+        {name: digest for name, _, _, digest in tables},
+        {name: count for name, count, _, _ in tables},
+    )
+
+
+def read_output_rows(path: str, table_name: str) -> Optional[List[Tuple[str, str, str, str]]]:
+    # One table's rows; the other tables are skipped line by line, so only these are ever held
+    try:
+        with gzip.open(path, "rt", encoding="utf-8", newline="\n") as f:
+            header = json.loads(f.readline())
+            for name, count, _, _ in header["tables"]:
+                if name != table_name:
+                    for _ in range(count):
+                        f.readline()
+                    continue
+                rows = []
+                for _ in range(count):
+                    fields = f.readline().rstrip("\n").split("\t")
+                    rows.append(tuple(_unescape_load_data_field(field) for field in fields))
+                return rows
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.getLogger("burster").warning("Ignoring unreadable output cache %s: %s", path, e)
+        return None
+    return []
+
+
+def write_output_artifact(path: str, artifact: OutputArtifact, frames: List[Tuple[str, AttributeFrame]]) -> None:
+    # The rows are streamed from the frames; they are never all held as tuples
+    header = {
+        "version": OUTPUT_CACHE_VERSION,
+        "input_hash": artifact.input_hash,
+        "tables": [
+            [name, artifact.counts[name], list(artifact.fingerprints[name]), artifact.digests[name]]
+            for name, _ in frames
+        ],
+    }
+    try:
+        with _atomic_file(path) as tmp_path, gzip.open(tmp_path, "wt", encoding="utf-8", newline="\n") as f:
+            f.write(json.dumps(header) + "\n")
+            for _, frame in frames:
+                for record in iter_frame_records(frame):
+                    f.write(_artifact_line(record))
+    except OSError as e:
+        # Without the cache the next run simply rebuilds
+        logging.getLogger("burster").warning("Could not write output cache %s: %s", path, e)
+
+
+def deployed_fingerprints(
+    config: configparser.RawConfigParser, tables: List[str]
+) -> Dict[str, Optional[Tuple[int, int]]]:
+    try:
+        with get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            existing = _list_radgroup_tables(cur)
+            fingerprints = {
+                table_name: table_fingerprint(cur, table_name, ATTRIBUTE_COLUMNS)
+                if table_name in existing
+                else None
+                for table_name in tables
+            }
             con.commit()
-            con.close()
+            return fingerprints
+    except mdb.Error as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+
+def save_output_artifact(
+    config: configparser.RawConfigParser,
+    path: str,
+    input_hash: str,
+    deployed: List[Tuple[str, AttributeFrame]],
+    digests: Dict[str, str],
+) -> None:
+    with metrics.phase("output_cache"):
+        fingerprints = deployed_fingerprints(config, [table_name for table_name, _ in deployed])
+        if any(fingerprint is None for fingerprint in fingerprints.values()):
+            return
+        counts = {table_name: len(frame) for table_name, frame in deployed}
+        write_output_artifact(path, OutputArtifact(input_hash, fingerprints, digests, counts), deployed)
+
+
+def deployed_table(staging_table: str) -> str:
+    # Name a staging table has once the swap is done
+    return staging_table[: -len("_tmp")] if staging_table.endswith("_tmp") else staging_table
+
+
+def sync_from_baseline(
+    config: configparser.RawConfigParser,
+    desired: List[Tuple[str, AttributeFrame]],
+    path: str,
+    perc: int,
+) -> None:
+    # The live tables hold exactly the rows cached at `path`, so only groups whose rows differ are
+    # read back and diffed; the rest of the tables is never scanned, and one table is held at a time
+    logger = logging.getLogger("burster")
+    try:
+        with metrics.phase("incremental_sync"), get_pool(config, "raddb").connection() as con:
+            cur = con.cursor()
+            drop_staged_tiers(cur)
+            live_perc = _table_tier(_list_radgroup_tables(cur).get("radgroupreply", ""))
+            con.begin()
+            for table_name, frame in desired:
+                cached = read_output_rows(path, table_name)
+                if cached is None:
+                    logger.warning("Output cache went unreadable; diffing all of %s", table_name)
+                    live_rows = read_live_rows(cur, table_name, for_update=True)
+                    records = dataframe_records(frame)
+                else:
+                    wanted: Dict[str, List[Tuple[str, str, str, str]]] = defaultdict(list)
+                    for record in iter_frame_records(frame):
+                        wanted[record[0]].append(record)
+                    current: Dict[str, List[Tuple[str, str, str, str]]] = defaultdict(list)
+                    for record in cached:
+                        current[record[0]].append(record)
+                    del cached
+                    changed = [
+                        group for group in list(wanted) + [g for g in current if g not in wanted]
+                        if wanted.get(group) != current.get(group)
+                    ]
+                    logger.info("%s: %d groups changed since the output cache baseline", table_name, len(changed))
+                    live_rows = read_live_group_rows(cur, table_name, changed)
+                    records = [record for group in changed for record in wanted.get(group, [])]
+                inserts, updates, deletes = diff_attribute_rows(live_rows, records)
+                logger.info(
+                    "%s: %d inserts, %d updates, %d deletes",
+                    table_name,
+                    len(inserts),
+                    len(updates),
+                    len(deletes),
+                )
+                apply_attribute_diff(cur, table_name, inserts, updates, deletes)
+            con.commit()
+            if live_perc != perc:
+                retag_live_tables(con, cur, perc)
+    except mdb.Error as e:
+        # The pool closes the failed connection, which rolls the transaction back
+        print("Error: {}".format(e))
+        sys.exit(1)
+
+
+def parse_plan_list(value: str) -> List[str]:
+    plans = [part.strip() for part in value.split(",") if part.strip()]
+    if not plans:
+        raise argparse.ArgumentTypeError(f"invalid plan list: {value!r}")
+    return plans
 
 
+def parse_percent_list(value: str) -> List[int]:
+    try:
+        tiers = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid percent list: {value!r}")
+    if not tiers or len(set(tiers)) != len(tiers):
+        raise argparse.ArgumentTypeError(f"invalid percent list: {value!r}")
+    return tiers
+
 
 def _overlay_env_to_config(cfg: configparser.RawConfigParser) -> None:
     # Map env vars to config sections/keys
     mapping = {
         "bbdb": {
             "host": "BBDB_HOST",
+            "port": "BBDB_PORT",
             "db": "BBDB_DB",
             "user": "BBDB_USER",
             "pass": "BBDB_PASS",
+            "plans_table": "BBDB_PLANS_TABLE",
+            "plans_filter": "BBDB_PLANS_FILTER",
+            "plans_file": "BBDB_PLANS_FILE",
+            "pool_size": "BBDB_POOL_SIZE",
+            "pool_ping_interval": "BBDB_POOL_PING_INTERVAL",
+            "pool_timeout": "BBDB_POOL_TIMEOUT",
+            "autocommit": "BBDB_AUTOCOMMIT",
+            "unique_checks": "BBDB_UNIQUE_CHECKS",
+            "foreign_key_checks": "BBDB_FOREIGN_KEY_CHECKS",
         },
         "raddb": {
             "host": "RADDB_HOST",
+            "port": "RADDB_PORT",
             "db": "RADDB_DB",
             "user": "RADDB_USER",
             "pass": "RADDB_PASS",
+            "pool_size": "RADDB_POOL_SIZE",
+            "pool_ping_interval": "RADDB_POOL_PING_INTERVAL",
+            "pool_timeout": "RADDB_POOL_TIMEOUT",
+            "autocommit": "RADDB_AUTOCOMMIT",
+            "unique_checks": "RADDB_UNIQUE_CHECKS",
+            "foreign_key_checks": "RADDB_FOREIGN_KEY_CHECKS",
         },
         "main": {
             "sbp": "BURSTER_SBP",
@@ -568,8 +3192,26 @@ def _overlay_env_to_config(cfg: configparser.RawConfigParser) -> None:
             "boost_perc": "BURSTER_BOOST_PERC",
             "session_timeout": "BURSTER_SESSION_TIMEOUT",
             "framed_pool": "BURSTER_FRAMED_POOL",
+            "loader": "BURSTER_LOADER",
+            "load_tmpdir": "BURSTER_LOAD_TMPDIR",
+            "defer_indexes": "BURSTER_DEFER_INDEXES",
+            "rate_cache_size": "BURSTER_RATE_CACHE_SIZE",
+            "metrics_textfile": "BURSTER_METRICS_TEXTFILE",
+            "metrics_json": "BURSTER_METRICS_JSON",
+            "output_cache": "BURSTER_OUTPUT_CACHE",
+            "verify_staging": "BURSTER_VERIFY_STAGING",
+            "keep_generations": "BURSTER_KEEP_GENERATIONS",
+            "raddb_targets": "RADDB_TARGETS",
+            "fanout_policy": "BURSTER_FANOUT_POLICY",
         },
     }
+    # Each RADDB_TARGETS entry reads RADDB_<NAME>_HOST etc.; anything unset falls back to the RADDB_ value
+    targets = [name.strip() for name in os.getenv("RADDB_TARGETS", "").split(",") if name.strip()]
+    for name in targets:
+        prefix = "RADDB_" + re.sub(r"[^0-9A-Za-z]", "_", name).upper() + "_"
+        mapping[f"raddb:{name}"] = {
+            key: prefix + env_key[len("RADDB_"):] for key, env_key in mapping["raddb"].items()
+        }
     for section, keys in mapping.items():
         for key, env_key in keys.items():
             val = os.getenv(env_key)
@@ -579,68 +3221,573 @@ def _overlay_env_to_config(cfg: configparser.RawConfigParser) -> None:
                 cfg.set(section, key, val)
 
 
-def main() -> None:
-    logger = setup_logging()
-
+def load_config() -> configparser.RawConfigParser:
     config = configparser.RawConfigParser()
     # Only read config file if explicitly set
     config_path = os.getenv("BURSTER_CONFIG_PATH")
     if config_path and os.path.isfile(config_path):
         config.read(config_path)
     _overlay_env_to_config(config)
+    return config
+
+
+def apply_args_to_config(cfg: configparser.RawConfigParser, args: argparse.Namespace) -> None:
+    # Command line settings that win over the environment
+    if args.file:
+        if not cfg.has_section("bbdb"):
+            cfg.add_section("bbdb")
+        cfg.set("bbdb", "plans_file", args.file)
+    if not cfg.has_section("main"):
+        cfg.add_section("main")
+    cfg.set("main", "load_workers", str(args.load_workers))
+
+
+def config_fingerprint() -> Tuple[Tuple[str, Optional[bytes]], ...]:
+    paths = [_DOTENV_PATH, os.getenv("BURSTER_CONFIG_PATH", "")]
+    fingerprint = []
+    for path in paths:
+        if not path:
+            continue
+        try:
+            with open(path, "rb") as f:
+                fingerprint.append((path, f.read()))
+        except OSError:
+            fingerprint.append((path, None))
+    return tuple(fingerprint)
+
+
+def _wait_until_settled(read: Callable[[], Any], value: Any, delay: float, stop: threading.Event) -> Any:
+    # Re-read every `delay` seconds until two reads agree; returns None once stopped
+    while not stop.wait(delay):
+        current = read()
+        if current == value:
+            return value
+        value = current
+    return None
+
+
+def watch(config: configparser.RawConfigParser, argv: Optional[List[str]] = None) -> None:
+    logger = logging.getLogger("burster")
+    args = parse_args(argv)
+    stop = threading.Event()
+
+    def _stop(signum: int, frame: Any) -> None:
+        logger.info("Received signal %d; stopping", signum)
+        stop.set()
 
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    logger.info(
+        "Watching plans every %gs (debounce %gs)", args.watch_interval, args.watch_debounce
+    )
+    current_config = config_fingerprint()
+    built: Optional[Tuple[int, int]] = None
+    while not stop.is_set():
+        if config_fingerprint() != current_config:
+            current_config = _wait_until_settled(
+                config_fingerprint, config_fingerprint(), args.watch_debounce, stop
+            )
+            if current_config is None:
+                break
+            logger.info("Configuration changed; reloading")
+            load_env()
+            close_pools()
+            try:
+                config = load_config()
+                args = parse_args(argv)
+                apply_args_to_config(config, args)
+            except SystemExit:
+                logger.error("Invalid arguments under the new configuration; keeping the old one")
+            built = None
+
+        try:
+            fingerprint = plans_fingerprint(config)
+            if built is not None and fingerprint != built:
+                logger.info("plans changed; waiting for it to settle")
+                fingerprint = _wait_until_settled(
+                    lambda: plans_fingerprint(config), fingerprint, args.watch_debounce, stop
+                )
+                if fingerprint is None:
+                    break
+        except (mdb.Error, OSError) as e:
+            logger.error("Could not check plans for changes: %s", e)
+            stop.wait(args.watch_interval)
+            continue
+
+        if fingerprint != built:
+            try:
+                run_once(config, args)
+                built = fingerprint
+            except SystemExit as e:
+                if e.code in (None, 0):
+                    built = fingerprint
+                else:
+                    logger.error("Rebuild failed; retrying at the next check")
+            except Exception:
+                logger.exception("Rebuild failed; retrying at the next check")
+        stop.wait(args.watch_interval)
+    logger.info("Stopped watching")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    setup_logging()
+    args = parse_args(argv)
+    config = load_config()
+    apply_args_to_config(config, args)
+    try:
+        if args.watch:
+            watch(config, argv)
+        else:
+            run_once(config, args)
+    finally:
+        close_pools()
+
+
+def run_once(config: configparser.RawConfigParser, args: argparse.Namespace) -> None:
+    metrics.reset()
+    success = False
+    try:
+        run(config, args)
+        success = True
+    except SystemExit as e:
+        success = e.code in (None, 0)
+        raise
+    finally:
+        write_run_metrics(config, success)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
-    # parser.add_argument('-f', "--file", help="Plans CSV file")
+    parser.add_argument(
+        "-f",
+        "--file",
+        help="Read the plans from this CSV file (PLAN, UL and DL columns) instead of the plans table",
+    )
     parser.add_argument(
         "-p",
         "--percent",
-        help="Burst percent",
+        help="Burst percent, or a comma-separated list to also stage extra tiers (first goes live)",
+        type=parse_percent_list,
+        default=os.getenv("BURSTER_PERCENT"),
+    )
+    parser.add_argument(
+        "--activate-tier",
+        help="Swap a tier staged by an earlier --percent list into place and exit",
         type=int,
-        default=int(os.getenv("BURSTER_PERCENT", "100")),
+        metavar="PERCENT",
     )
-    args = parser.parse_args()
-    perc = args.percent
-
-    # rows = read_csv_file(args.file) if args.file else read_plan_table(config)
-    rows = read_plan_table(config)
-    total = len(rows)
-    logger.info("Loaded %d plans", total)
+    parser.add_argument(
+        "--rollback",
+        help="Swap the generation that was live N deploys ago (default 1) back into place and exit",
+        type=int,
+        nargs="?",
+        const=1,
+        metavar="N",
+    )
+    parser.add_argument(
+        "--retune",
+        help="Rewrite only the Mikrotik-Rate-Limit rows of the live tables for --percent and exit",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--engine",
+        help="Attribute row engine",
+        choices=ENGINES,
+        default=os.getenv("BURSTER_ENGINE", "buffers"),
+    )
+    parser.add_argument(
+        "--incremental",
+        help="Diff against the live tables and apply only the changed rows",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stream",
+        help="Stream plans in chunks straight into the staging tables",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--pipeline",
+        help="Like --stream, but overlap table creation, reading/building and loading in separate threads",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        help="Built chunks --pipeline may queue ahead of the loader",
+        type=int,
+        default=int(os.getenv("BURSTER_PIPELINE_DEPTH", "4")),
+    )
+    parser.add_argument(
+        "--workers",
+        help="Build the attribute rows on this many processes",
+        type=int,
+        default=int(os.getenv("BURSTER_WORKERS", "1")),
+    )
+    parser.add_argument(
+        "--chunk-size",
+        help="Plans per chunk in --stream and --pipeline mode, and per --workers task",
+        type=int,
+        default=int(os.getenv("BURSTER_CHUNK_SIZE", "5000")),
+    )
+    parser.add_argument(
+        "--load-workers",
+        help="Load the staging tables over this many parallel connections",
+        type=int,
+        default=int(os.getenv("BURSTER_LOAD_WORKERS", "1")),
+    )
+    parser.add_argument(
+        "--reply-chunks",
+        help="Split the radgroupreply load into this many parallel chunks",
+        type=int,
+        default=int(os.getenv("BURSTER_REPLY_CHUNKS", "1")),
+    )
+    parser.add_argument(
+        "--plans",
+        help="Regenerate only these plans (comma-separated) and update them in place",
+        type=parse_plan_list,
+    )
+    parser.add_argument(
+        "--where",
+        help="Regenerate only the plans matching this SQL condition on the plans table",
+    )
+    parser.add_argument(
+        "--watch",
+        help="Keep running and rebuild whenever plans or the configuration change",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        help="Seconds between change checks in --watch mode",
+        type=float,
+        default=float(os.getenv("BURSTER_WATCH_INTERVAL", "60")),
+    )
+    parser.add_argument(
+        "--watch-debounce",
+        help="Seconds a change must stay put before --watch rebuilds",
+        type=float,
+        default=float(os.getenv("BURSTER_WATCH_DEBOUNCE", "10")),
+    )
+    args = parser.parse_args(argv)
+    # None unless -p or BURSTER_PERCENT set it; --plans/--where then keep the live tier
+    args.percent_given = args.percent is not None
+    if args.percent is None:
+        args.percent = [DEFAULT_PERCENT]
+    if (args.stream or args.pipeline) and args.incremental:
+        parser.error("--stream/--pipeline cannot be combined with --incremental")
+    if args.incremental and len(args.percent) > 1:
+        parser.error("--incremental takes a single percent")
+    if args.watch and args.activate_tier is not None:
+        parser.error("--watch cannot be combined with --activate-tier")
+    if args.rollback is not None:
+        if args.rollback < 1:
+            parser.error("--rollback takes a positive number of generations")
+        for flag, value in (
+            ("--activate-tier", args.activate_tier is not None),
+            ("--retune", args.retune),
+            ("--plans/--where", args.plans or args.where),
+            ("--incremental", args.incremental),
+            ("--stream", args.stream),
+            ("--pipeline", args.pipeline),
+            ("--watch", args.watch),
+        ):
+            if value:
+                parser.error(f"--rollback cannot be combined with {flag}")
+    if args.retune:
+        for flag, value in (
+            ("--activate-tier", args.activate_tier is not None),
+            ("--plans/--where", args.plans or args.where),
+            ("--incremental", args.incremental),
+            ("--stream", args.stream),
+            ("--pipeline", args.pipeline),
+            ("--watch", args.watch),
+        ):
+            if value:
+                parser.error(f"--retune cannot be combined with {flag}")
+        if len(args.percent) > 1:
+            parser.error("--retune takes a single percent")
+    if args.plans and args.where:
+        parser.error("--plans cannot be combined with --where")
+    if args.plans or args.where:
+        for flag, value in (
+            ("--stream", args.stream),
+            ("--pipeline", args.pipeline),
+            ("--incremental", args.incremental),
+            ("--activate-tier", args.activate_tier is not None),
+            ("--watch", args.watch),
+        ):
+            if value:
+                parser.error(f"--plans/--where cannot be combined with {flag}")
+        if len(args.percent) > 1:
+            parser.error("--plans/--where take a single percent")
+    return args
+
+
+def run(config: configparser.RawConfigParser, args: argparse.Namespace) -> None:
+    logger = logging.getLogger("burster")
+    targets = get_raddb_targets(config)
+    if len(targets) == 1:
+        # A single target deploys exactly like a plain [raddb]
+        config, targets = target_config(config, targets[0]), ["raddb"]
+    if len(targets) > 1 and (args.stream or args.pipeline):
+        raise RuntimeError("--stream and --pipeline load a single RADIUS DB; unset RADDB_TARGETS to use them")
+
+    if args.rollback is not None:
+        drop_threads = each_target(
+            config,
+            targets,
+            "rollback",
+            "rollback",
+            lambda target: rollback_generation(target, args.rollback),
+        )
+        for drop_thread in drop_threads:
+            if drop_thread is not None:
+                drop_thread.join()
+        return
 
-    logger.info("Creating temporary tables")
-    create_temp_tables(config)
+    if args.activate_tier is not None:
+        drop_threads = each_target(
+            config,
+            targets,
+            "activate_tier",
+            f"tier {args.activate_tier} activation",
+            lambda target: activate_tier(target, args.activate_tier),
+        )
+        for drop_thread in drop_threads:
+            if drop_thread is not None:
+                drop_thread.join()
+        return
 
+    tiers = args.percent
+    perc = tiers[0]
     main_config = get_main_config(config)
-    radgroupcheck_rows: List[Dict[str, str]] = []
-    radgroupreply_rows: List[Dict[str, str]] = []
+    cache_size = get_rate_cache_size(config)
+    cache = SpeedTierCache(cache_size) if cache_size > 0 else None
+    defer_indexes = get_defer_indexes(config)
+    # What every staging table must hold, checked right before the swap
+    fingerprints: Optional[Dict[str, Tuple[int, int]]] = {} if get_verify_staging(config) else None
+
+    if args.retune:
+        rows = read_plan_table(config)
+        logger.info("Retuning %d plans to percent=%d", len(rows), perc)
+        each_target(
+            config,
+            targets,
+            "retune",
+            "retune",
+            lambda target: retune_plans(target, rows, perc, main_config, cache),
+        )
+        if cache is not None:
+            cache.log_stats(logger)
+        return
 
-    logger.info("Building attribute dataframes for %d plans (percent=%d)", total, perc)
-    log_interval = max(1, total // 10)  # 10% intervals
-    with tqdm(total=total, desc="Processing plans", unit="plan") as pbar:
-        for idx, row in enumerate(rows, 1):
-            plan_check_rows, plan_reply_rows = build_plan_attribute_rows(row, perc, main_config)
-            radgroupcheck_rows.extend(plan_check_rows)
-            radgroupreply_rows.extend(plan_reply_rows)
-            pbar.update(1)
-            if idx % log_interval == 0 or idx == total:
-                logger.info("Progress: %d/%d (%.0f%%)", idx, total, (idx / total) * 100)
+    if args.plans or args.where:
+        rows = read_plan_table(config, args.plans, args.where)
+        missing = sorted(set(args.plans or []) - {row.PLAN for row in rows})
+        if missing:
+            logger.warning("No such plans, left untouched: %s", ", ".join(missing))
+        if not rows:
+            logger.info("No matching plans; nothing to do")
+            return
+        logger.info("Updating %d plans in place (engine=%s)", len(rows), args.engine)
+        each_target(
+            config,
+            targets,
+            "update_plans",
+            "plan update",
+            lambda target: update_plans(
+                target, rows, perc if args.percent_given else None, main_config, args.engine, cache
+            ),
+        )
+        logger.info("Completed updating RADIUS policy tables")
+        return
 
-    logger.info("Appending one-off groups")
-    append_one_off_groups(radgroupcheck_rows, radgroupreply_rows)
+    if args.pipeline:
+        logger.info(
+            "Pipelining plans in chunks of %d (percent=%d, engine=%s, depth=%d)",
+            args.chunk_size,
+            perc,
+            args.engine,
+            args.pipeline_depth,
+        )
+        total, check_count, reply_count = pipeline_into_temp_tables(
+            config,
+            tiers,
+            main_config,
+            args.engine,
+            args.chunk_size,
+            args.pipeline_depth,
+            args.load_workers,
+            args.reply_chunks,
+            cache,
+            defer_indexes,
+            fingerprints,
+            args.workers,
+        )
+    elif args.stream:
+        logger.info("Creating temporary tables")
+        create_temp_tables(config, tiers, defer_indexes)
+        logger.info(
+            "Streaming plans in chunks of %d (percent=%d, engine=%s)",
+            args.chunk_size,
+            perc,
+            args.engine,
+        )
+        total, check_count, reply_count = stream_into_temp_tables(
+            config,
+            tiers,
+            main_config,
+            args.engine,
+            args.chunk_size,
+            args.load_workers,
+            args.reply_chunks,
+            cache,
+            fingerprints,
+            args.workers,
+        )
+    if args.stream or args.pipeline:
+        if cache is not None:
+            cache.log_stats(logger)
+        logger.info(
+            "Loaded %d plans into %d radgroupcheck rows and %d radgroupreply rows",
+            total,
+            check_count,
+            reply_count,
+        )
+        if defer_indexes:
+            build_staged_indexes(config, tiers)
+        if fingerprints is not None:
+            verify_staged_tables(config, fingerprints)
+        logger.info("Swapping temp tables into place")
+        drop_thread = swap_temp_tables(config)
+        logger.info("Completed updating RADIUS policy tables")
+        if drop_thread is not None:
+            drop_thread.join()
+        return
 
-    radgroupcheck_df = pd.DataFrame(radgroupcheck_rows, columns=["groupname", "attribute", "op", "value"])
-    radgroupreply_df = pd.DataFrame(radgroupreply_rows, columns=["groupname", "attribute", "op", "value"])
+    rows = read_plan_table(config)
+    total = len(rows)
+    logger.info("Loaded %d plans", total)
 
+    output_cache = get_output_cache(config)
+    baseline: Optional[OutputArtifact] = None
+    if output_cache:
+        with metrics.phase("output_cache"):
+            input_hash = output_input_hash(rows, main_config, tiers)
+            artifact = read_output_artifact(output_cache)
+            # Only trust the artifact while every target's deployed tables still hold exactly its rows
+            if artifact is not None and all(
+                deployed_fingerprints(target_config(config, target), list(artifact.fingerprints))
+                == artifact.fingerprints
+                for target in targets
+            ):
+                baseline = artifact
+        if baseline is not None and baseline.input_hash == input_hash:
+            logger.info("Inputs unchanged since the last deploy and the live tables match it; nothing to do")
+            return
+
+    if args.workers > 1:
+        logger.info(
+            "Building attribute dataframes for %d plans on %d processes (percent=%d, engine=%s)",
+            total,
+            args.workers,
+            perc,
+            args.engine,
+        )
+        radgroupcheck_df, radgroupreply_df = build_attribute_frames_sharded(
+            rows, perc, main_config, args.engine, args.workers, args.chunk_size, cache
+        )
+    else:
+        logger.info(
+            "Building attribute dataframes for %d plans (percent=%d, engine=%s)", total, perc, args.engine
+        )
+        radgroupcheck_df, radgroupreply_df = build_attribute_frames(
+            rows, perc, main_config, args.engine, cache=cache
+        )
+    if cache is not None:
+        cache.log_stats(logger)
+
+    frames = staged_frames(radgroupcheck_df, radgroupreply_df, rows, tiers, main_config, cache)
+    if defer_indexes and not args.incremental:
+        # Rows arrive close to groupname index order, which keeps the deferred index build sequential
+        with metrics.phase("build_dataframes"):
+            frames = [(table_name, sort_frame_by_group(frame)) for table_name, frame in frames]
+    deployed: List[Tuple[str, AttributeFrame]] = []
+    digests: Dict[str, str] = {}
+    if output_cache:
+        deployed = [(deployed_table(table_name), frame) for table_name, frame in frames]
+        with metrics.phase("output_cache"):
+            digests = {table_name: frame_digest(frame) for table_name, frame in deployed}
+        if baseline is not None and baseline.digests == digests:
+            logger.info("Generated rows are identical to the last deploy; nothing to do")
+            write_output_artifact(output_cache, baseline._replace(input_hash=input_hash), deployed)
+            return
+
+    if args.incremental:
+        logger.info("Applying incremental changes to live tables")
+        if baseline is not None:
+            each_target(
+                config,
+                targets,
+                "incremental_sync",
+                "incremental sync",
+                lambda target: sync_from_baseline(target, deployed, output_cache, perc),
+            )
+        else:
+            each_target(
+                config,
+                targets,
+                "incremental_sync",
+                "incremental sync",
+                lambda target: sync_incremental(target, radgroupcheck_df, radgroupreply_df, perc),
+            )
+        if output_cache:
+            save_output_artifact(target_config(config, targets[0]), output_cache, input_hash, deployed, digests)
+        logger.info("Completed updating RADIUS policy tables")
+        return
+
+    if fingerprints is not None:
+        add_frame_fingerprints(fingerprints, frames)
+    if len(targets) > 1:
+        if len(tiers) > 1:
+            logger.info("Staging extra burst tiers: %s", ", ".join(str(p) for p in tiers[1:]))
+        deploy_to_targets(
+            config,
+            targets,
+            frames,
+            tiers,
+            args.load_workers,
+            args.reply_chunks,
+            defer_indexes,
+            fingerprints,
+        )
+        if output_cache:
+            save_output_artifact(target_config(config, targets[0]), output_cache, input_hash, deployed, digests)
+        logger.info("Completed updating RADIUS policy tables on %d targets", len(targets))
+        return
+
+    # Created only now so the staged tiers of the last deploy survive a run that turns out to be a no-op
+    logger.info("Creating temporary tables")
+    create_temp_tables(config, tiers, defer_indexes)
     logger.info(
         "Inserting %d radgroupcheck rows and %d radgroupreply rows",
         len(radgroupcheck_df),
         len(radgroupreply_df),
     )
-    bulk_insert_dataframe(config, "radgroupcheck_tmp", radgroupcheck_df)
-    bulk_insert_dataframe(config, "radgroupreply_tmp", radgroupreply_df)
+    if len(tiers) > 1:
+        logger.info("Staging extra burst tiers: %s", ", ".join(str(p) for p in tiers[1:]))
+    load_frames(config, frames, args.load_workers, args.reply_chunks)
+    if defer_indexes:
+        build_staged_indexes(config, tiers)
+    if fingerprints is not None:
+        verify_staged_tables(config, fingerprints)
 
     logger.info("Swapping temp tables into place")
-    swap_temp_tables(config)
+    drop_thread = swap_temp_tables(config)
+    if output_cache:
+        save_output_artifact(config, output_cache, input_hash, deployed, digests)
     logger.info("Completed updating RADIUS policy tables")
+    if drop_thread is not None:
+        drop_thread.join()
 
 
 
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import math
+import time
+import bisect
+import random
+import argparse
+import platform
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Tuple
+
+import pymysql
+
+import bench
+import burster
+
+
+# FreeRADIUS' stock authorize_group_reply_query
+REPLY_QUERY = "SELECT id, groupname, attribute, value, op FROM radgroupreply WHERE groupname = %s ORDER BY id;"
+
+
+class Lookup(NamedTuple):
+    started: float  # perf_counter, the clock burster's phase spans use
+    seconds: float
+    outcome: str  # ok, empty (no rows for the group) or error
+    error: Optional[str]
+
+
+def one_off_groups() -> List[str]:
+    check: List[Dict[str, str]] = []
+    reply: List[Dict[str, str]] = []
+    burster.append_one_off_groups(check, reply)
+    return sorted({row["groupname"] for row in check + reply})
+
+
+def raddb_connector(args: argparse.Namespace) -> Callable[[], Any]:
+    # A client of its own per lookup thread, the way a RADIUS server's pool holds them
+    if args.backend == "sqlite":
+        path = os.path.join(args.workdir, f"{args.raddb}.sqlite3")
+        return lambda: bench.StandInConnection(path)
+    return lambda: pymysql.connect(
+        host=args.mysql_host,
+        port=args.mysql_port,
+        user=args.mysql_user,
+        password=args.mysql_pass,
+        database=args.raddb,
+        autocommit=True,
+        connect_timeout=5,
+    )
+
+
+def lookup_client(
+    connect: Callable[[], Any],
+    plan_groups: List[str],
+    one_offs: List[str],
+    one_off_share: float,
+    rate: float,
+    seed: int,
+    stop: threading.Event,
+    lookups: List[Lookup],
+) -> None:
+    rng = random.Random(seed)
+    interval = 1.0 / rate if rate > 0 else 0.0
+    next_at = time.perf_counter()
+    con = None
+    while not stop.is_set():
+        group = rng.choice(one_offs if rng.random() < one_off_share else plan_groups)
+        started = time.perf_counter()
+        try:
+            if con is None:
+                con = connect()
+            cur = con.cursor()
+            cur.execute(REPLY_QUERY, (group,))
+            rows = cur.fetchall()
+            cur.close()
+            lookups.append(Lookup(started, time.perf_counter() - started, "ok" if rows else "empty", None))
+        except Exception as e:
+            # Any failure is a failed lookup; a client that died instead would just show fewer lookups
+            lookups.append(Lookup(started, time.perf_counter() - started, "error", str(e) or type(e).__name__))
+            if con is not None:
+                try:
+                    con.close()
+                except Exception:
+                    pass
+            con = None  # reconnect, as the RADIUS server would
+        if interval:
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+    if con is not None:
+        con.close()
+
+
+# --- Report -----------------------------------------------------------------
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    # Nearest rank
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(lookups: List[Lookup]) -> Dict[str, Any]:
+    latencies = sorted(lookup.seconds for lookup in lookups)
+    outcomes = Counter(lookup.outcome for lookup in lookups)
+    return {
+        "lookups": len(lookups),
+        "empty": outcomes["empty"],
+        "errors": outcomes["error"],
+        "error_messages": dict(Counter(lookup.error for lookup in lookups if lookup.error).most_common(5)),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def lookups_by_phase(
+    lookups: List[Lookup], spans: List[Tuple[str, float, float]], run_started: float, run_ended: float
+) -> "OrderedDict[str, List[Lookup]]":
+    # A lookup counts toward every phase running when it was sent; nested and concurrent phases overlap
+    lookups = sorted(lookups, key=lambda lookup: lookup.started)
+    starts = [lookup.started for lookup in lookups]
+    groups: "OrderedDict[str, List[Lookup]]" = OrderedDict()
+    groups["baseline"] = lookups[: bisect.bisect_left(starts, run_started)]
+    members: "OrderedDict[str, set]" = OrderedDict()
+    for name, span_started, span_ended in sorted(spans, key=lambda span: span[1]):
+        members.setdefault(name, set()).update(
+            range(bisect.bisect_left(starts, span_started), bisect.bisect_right(starts, span_ended))
+        )
+    in_phase = set().union(*members.values())
+    for name, indexes in members.items():
+        groups[name] = [lookups[idx] for idx in sorted(indexes)]
+    run = range(bisect.bisect_left(starts, run_started), bisect.bisect_right(starts, run_ended))
+    groups["between phases"] = [lookups[idx] for idx in run if idx not in in_phase]
+    groups["after"] = lookups[bisect.bisect_right(starts, run_ended):]
+    groups["run"] = [lookups[idx] for idx in run]
+    return groups
+
+
+def print_report(report: "OrderedDict[str, Dict[str, Any]]") -> None:
+    width = max(len(name) for name in report)
+    print(
+        f"{'phase':<{width}}  {'lookups':>8}  {'p50 ms':>8}  {'p99 ms':>8}  {'max ms':>9}  {'empty':>6}  {'errors':>6}",
+        file=sys.stderr,
+    )
+    for name, stats in report.items():
+        print(
+            f"{name:<{width}}  {stats['lookups']:>8}  {stats['p50_ms']:>8.2f}  {stats['p99_ms']:>8.2f}  "
+            f"{stats['max_ms']:>9.2f}  {stats['empty']:>6}  {stats['errors']:>6}",
+            file=sys.stderr,
+        )
+
+
+def parse_size(value: str) -> int:
+    sizes = bench.parse_sizes(value)
+    if len(sizes) != 1:
+        raise argparse.ArgumentTypeError(f"expected a single plan count: {value!r}")
+    return sizes[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay concurrent RADIUS group lookups against radgroupreply while burster runs "
+        "and report their latency per burster phase. "
+        "Unrecognized arguments are passed through to burster (e.g. --stream --load-workers 4)."
+    )
+    parser.add_argument("--plans", type=parse_size, default=parse_size("100k"),
+                        help="Plan count, k/m suffixes allowed (default 100k)")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent lookup connections")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Lookups per second per client (default 0: back to back)")
+    parser.add_argument("--one-off-share", type=float, default=0.1,
+                        help="Share of lookups for the one-off groups (websafe, unauth, ...)")
+    parser.add_argument("--baseline", type=float, default=2.0,
+                        help="Seconds of lookups before burster starts")
+    parser.add_argument("--cooldown", type=float, default=1.0,
+                        help="Seconds of lookups after burster finishes")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Skip the unmeasured first run, so the measured run starts from empty live tables")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="mysql")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest_results.json", help="JSON results path ('-' for stdout)")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--workdir", default=".bench", help="Directory for SQLite databases")
+    parser.add_argument("--bbdb", default="burster_loadtest_bbdb")
+    parser.add_argument("--raddb", default="burster_loadtest_raddb")
+    parser.add_argument("--mysql-host", default=os.getenv("BENCH_MYSQL_HOST", "127.0.0.1"))
+    parser.add_argument("--mysql-port", type=int, default=int(os.getenv("BENCH_MYSQL_PORT", "3306")))
+    parser.add_argument("--mysql-user", default=os.getenv("BENCH_MYSQL_USER", "root"))
+    parser.add_argument("--mysql-pass", default=os.getenv("BENCH_MYSQL_PASS", ""))
+    parser.set_defaults(targets=1)
+    args, burster_args = parser.parse_known_args()
+
+    bench.configure_env(args)
+    if args.backend == "sqlite":
+        os.makedirs(args.workdir, exist_ok=True)
+        burster.set_connector(bench.sqlite_connector(args.workdir))
+
+    plans = bench.generate_plans(args.plans, args.seed)
+    bench.prepare_databases(args, plans)
+    if not args.no_warmup:
+        # Live tables a RADIUS server would already be reading from
+        burster.main(burster_args)
+
+    stop = threading.Event()
+    connect = raddb_connector(args)
+    plan_groups = [plan for plan, _, _ in plans]
+    one_offs = one_off_groups()
+    per_client: List[List[Lookup]] = [[] for _ in range(args.clients)]
+    clients = [
+        threading.Thread(
+            target=lookup_client,
+            args=(connect, plan_groups, one_offs, args.one_off_share, args.rate,
+                  args.seed + idx, stop, per_client[idx]),
+            name=f"lookup-{idx}",
+            daemon=True,
+        )
+        for idx in range(args.clients)
+    ]
+    for client in clients:
+        client.start()
+
+    exit_code: Any = 0
+    try:
+        time.sleep(args.baseline)
+        run_started = time.perf_counter()
+        try:
+            burster.main(burster_args)
+        except SystemExit as e:
+            exit_code = e.code
+        run_ended = time.perf_counter()
+        spans = list(burster.metrics.spans)
+        time.sleep(args.cooldown)
+    finally:
+        stop.set()
+        for client in clients:
+            client.join()
+
+    lookups = [lookup for client_lookups in per_client for lookup in client_lookups]
+    report = OrderedDict(
+        (name, summarize(group))
+        for name, group in lookups_by_phase(lookups, spans, run_started, run_ended).items()
+        if group or name in ("baseline", "run")
+    )
+    print_report(report)
+    if exit_code not in (None, 0):
+        print(f"burster exited with {exit_code}", file=sys.stderr)
+
+    results = {
+        "label": args.label,
+        "backend": args.backend,
+        "burster_args": burster_args,
+        "plans": args.plans,
+        "clients": args.clients,
+        "rate": args.rate,
+        "burster_exit": exit_code,
+        "burster_seconds": run_ended - run_started,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "phases": report,
+    }
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+            fh.write("\n")
+
+
+if __name__ == "__main__":
+    main()